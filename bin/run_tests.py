@@ -87,13 +87,17 @@ def main():
     if args.verbose:
         pytest_cmd.append("-v")
     
-    # Add coverage if requested
+    # Coverage and HTML report options; the serial pass appends to the parallel
+    # pass's coverage data and writes its own HTML report instead of overwriting
+    parallel_reports = []
+    serial_reports = []
     if args.coverage:
-        pytest_cmd.extend(["--cov=server", "--cov-report=term", "--cov-report=html"])
-    
-    # Add HTML report if requested
+        coverage_opts = ["--cov=server", "--cov-report=term", "--cov-report=html"]
+        parallel_reports.extend(coverage_opts)
+        serial_reports.extend(coverage_opts + ["--cov-append"])
     if args.html:
-        pytest_cmd.append("--html=test-report.html")
+        parallel_reports.append("--html=test-report.html")
+        serial_reports.append("--html=test-report-serial.html")
     
     # Set up test markers based on options
     markers = []
@@ -102,26 +106,32 @@ def main():
     if not args.slow:
         markers.append("not slow")
     
-    if markers:
-        marker_expr = " and ".join(markers)
-        pytest_cmd.extend(["-m", marker_expr])
-    
     # Add the test pattern - ensure all paths are converted to strings
     tests_dir_str = str(TESTS_DIR)
     
     # Add the tests directory
-    pytest_cmd.append(tests_dir_str)
+    targets = [tests_dir_str]
     
     # Add pattern filter if specified
     if args.pattern:
-        pytest_cmd.extend(["-k", args.pattern])
-    
-    # Print the command being run
-    print(f"Running: {' '.join(pytest_cmd)}")
-    
-    # Run the tests and return the exit code
-    result = subprocess.run(pytest_cmd)
-    return result.returncode
+        targets.extend(["-k", args.pattern])
+    
+    # Parallel tests are spread over all cores by pytest-xdist (see pytest.ini);
+    # tests marked serial run afterwards in a single process
+    parallel_cmd = pytest_cmd + parallel_reports + ["-m", " and ".join(markers + ["not serial"])] + targets
+    serial_cmd = pytest_cmd + serial_reports + ["-n", "0", "-m", " and ".join(markers + ["serial"])] + targets
+    
+    returncode = 0
+    for cmd in (parallel_cmd, serial_cmd):
+        # Print the command being run
+        print(f"Running: {' '.join(cmd)}")
+        
+        result = subprocess.run(cmd)
+        # Exit code 5 means no tests were selected, which is fine for either pass
+        if result.returncode not in (0, 5):
+            returncode = result.returncode
+    
+    return returncode
 
 if __name__ == "__main__":
     # Ensure we're running in the correct directory
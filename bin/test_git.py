@@ -6,6 +6,7 @@ This script directly calls the Git tool functions to verify they work.
 import os
 import sys
 import json
+import asyncio
 
 # Add parent directory to path to import server.py
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -28,7 +29,7 @@ def test_git_status():
     """Test the git_status function"""
     print("\n--- Testing git_status() ---")
     try:
-        result = git_status(detailed=True)
+        result = asyncio.run(git_status(detailed=True))
         if result["success"]:
             print(f"Success! Branch: {result['status']['branch']}")
             print(f"Clean working directory: {result['status']['is_clean']}")
@@ -53,7 +54,7 @@ def test_git_log(count=5):
     """Test the git_log function"""
     print(f"\n--- Testing git_log(count={count}) ---")
     try:
-        result = git_log(count=count, show_stats=True)
+        result = asyncio.run(git_log(count=count, show_stats=True))
         if result["success"]:
             print(f"Success! Retrieved {len(result['commits'])} commits")
             
@@ -98,7 +99,7 @@ def test_git_diff(file_path=""):
     """Test the git_diff function"""
     print(f"\n--- Testing git_diff(file_path='{file_path}') ---")
     try:
-        result = git_diff(file_path=file_path)
+        result = asyncio.run(git_diff(file_path=file_path))
         if result["success"]:
             print(f"Success! Files changed: {len(result['files_changed'])}")
             
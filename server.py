@@ -6,9 +6,13 @@ with browser-use integration.
 import os
 import json
 import sys
+import asyncio
 import logging
 import time
 import signal
+import copy
+import shutil
+import functools
 from typing import Dict, List, Any, Literal, Optional
 from pathlib import Path
 
@@ -47,6 +51,9 @@ logger.info(f"Log file: {log_file}")
 use_stdio = "--stdio" in sys.argv
 logger.info(f"Using stdio mode: {use_stdio}")
 
+# Environment variables worth logging at stdio startup in debug mode
+_DEBUG_ENV_VARS = ("PYTHONPATH", "PYTHONHOME", "PYTHONUNBUFFERED", "PYTHONDONTWRITEBYTECODE", "MCP_DEBUG")
+
 # Setup signal handlers for graceful shutdown
 def signal_handler(sig, frame):
     logger.info(f"Received signal {sig}, shutting down gracefully...")
@@ -148,31 +155,188 @@ def write_file(path: str, content: str) -> bool:
         logger.error(f"Error writing file: {str(e)}")
         return False
 
-def run_command(cmd: List[str]) -> Dict[str, Any]:
-    """Run a shell command and return the result."""
+# Spawn read-only commands without closing inherited file descriptors so that
+# CPython can use posix_spawn (vfork+exec) instead of a full fork of the server
+FAST_SPAWN = True
+
+@functools.lru_cache(maxsize=None)
+def _resolve_executable(name: str) -> str:
+    """Resolve a bare command name to an absolute path (posix_spawn needs one)."""
+    return shutil.which(name) or name
+
+def _spawn_args(cmd: List[str], read_only: bool) -> tuple:
+    """Return the command and extra spawn kwargs, applying the fast spawn path if eligible."""
+    if FAST_SPAWN and read_only and cmd:
+        return [_resolve_executable(cmd[0])] + list(cmd[1:]), {"close_fds": False}
+    return cmd, {}
+
+def run_command(cmd: List[str], read_only: bool = False, text: bool = True) -> Dict[str, Any]:
+    """
+    Run a shell command and return the result.
+    
+    Args:
+        cmd: Command and its arguments
+        read_only: Whether the command only reads state (eligible for the fast spawn path)
+        text: Whether to decode stdout; when False the output is returned as raw bytes
+    
+    Returns:
+        Dict with success flag, output, error and return code
+    """
     import subprocess
+    cmd, spawn_kwargs = _spawn_args(cmd, read_only)
     try:
         result = subprocess.run(
             cmd,
             capture_output=True,
-            text=True,
-            check=False
+            text=text,
+            check=False,
+            **spawn_kwargs
         )
+        error = result.stderr if text else result.stderr.decode("utf-8", "replace")
         return {
             "success": result.returncode == 0,
             "output": result.stdout,
-            "error": result.stderr,
+            "error": error,
             "returncode": result.returncode
         }
     except Exception as e:
         logger.error(f"Error running command: {str(e)}")
         return {
             "success": False,
-            "output": "",
+            "output": "" if text else b"",
             "error": str(e),
             "returncode": -1
         }
 
+async def run_command_async(
+    cmd: List[str],
+    read_only: bool = False,
+    text: bool = True,
+    max_bytes: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Run a command without blocking the event loop and return the result.
+    
+    Independent calls can be overlapped with asyncio.gather. The result has
+    the same shape as run_command's plus a "truncated" flag.
+    
+    Args:
+        cmd: Command and its arguments
+        read_only: Whether the command only reads state (eligible for the fast spawn path)
+        text: Whether to decode stdout; when False the output is returned as raw bytes
+        max_bytes: Stop reading stdout after this many bytes and kill the process;
+            the output is cut back to the last complete line
+    
+    Returns:
+        Dict with success flag, output, error, return code and truncated flag
+    """
+    cmd, spawn_kwargs = _spawn_args(cmd, read_only)
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            **spawn_kwargs
+        )
+        truncated = False
+        if max_bytes is None:
+            stdout, stderr = await proc.communicate()
+        else:
+            # Drain stderr in the background so the process can't block on it
+            stderr_task = asyncio.ensure_future(proc.stderr.read())
+            try:
+                stdout = await proc.stdout.readexactly(max_bytes + 1)
+                truncated = True
+                try:
+                    proc.kill()
+                except ProcessLookupError:
+                    pass
+                stdout = stdout[:stdout.rfind(b"\n", 0, max_bytes) + 1]
+            except asyncio.IncompleteReadError as e:
+                stdout = e.partial
+            stderr = await stderr_task
+            await proc.wait()
+        return {
+            "success": truncated or proc.returncode == 0,
+            "output": stdout.decode("utf-8", "replace") if text else stdout,
+            "error": stderr.decode("utf-8", "replace"),
+            "returncode": proc.returncode,
+            "truncated": truncated
+        }
+    except Exception as e:
+        logger.error(f"Error running command: {str(e)}")
+        return {
+            "success": False,
+            "output": "" if text else b"",
+            "error": str(e),
+            "returncode": -1,
+            "truncated": False
+        }
+
+# ==========================================
+# INSTRUCTION STORAGE
+# ==========================================
+
+# Instructions kept in memory when AERITH_STORE=memory, keyed by project root and id
+_memory_instructions: Dict[tuple, Dict[str, Any]] = {}
+
+def _instruction_store() -> str:
+    """Return the instruction storage backend, "file" (default) or "memory"."""
+    return os.environ.get("AERITH_STORE", "file")
+
+def _instructions_dir() -> str:
+    """Directory holding the instruction JSON files of the current project."""
+    return os.path.join(get_project_root(), ".aerith", "instructions")
+
+def _save_instruction(instruction: Dict[str, Any]) -> Optional[str]:
+    """Persist an instruction in the configured store and return its file path (None in memory)."""
+    if _instruction_store() == "memory":
+        _memory_instructions[(str(get_project_root()), instruction["id"])] = copy.deepcopy(instruction)
+        return None
+    
+    instructions_dir = _instructions_dir()
+    os.makedirs(instructions_dir, exist_ok=True)
+    instruction_path = os.path.join(instructions_dir, f"{instruction['id']}.json")
+    with open(instruction_path, 'w') as f:
+        json.dump(instruction, f, indent=2)
+    return instruction_path
+
+def _load_instruction(instruction_id: str) -> Optional[Dict[str, Any]]:
+    """Load an instruction from the configured store, or None if it does not exist."""
+    if _instruction_store() == "memory":
+        instruction = _memory_instructions.get((str(get_project_root()), instruction_id))
+        return copy.deepcopy(instruction) if instruction is not None else None
+    
+    instruction_path = os.path.join(_instructions_dir(), f"{instruction_id}.json")
+    if not os.path.exists(instruction_path):
+        return None
+    with open(instruction_path, 'r') as f:
+        return json.load(f)
+
+def _list_instructions() -> List[Dict[str, Any]]:
+    """Load every instruction of the current project, skipping unreadable files."""
+    if _instruction_store() == "memory":
+        root = str(get_project_root())
+        return [copy.deepcopy(instruction) for (project, _), instruction in _memory_instructions.items()
+                if project == root]
+    
+    instructions_dir = _instructions_dir()
+    if not os.path.exists(instructions_dir):
+        return []
+    
+    instructions = []
+    for filename in os.listdir(instructions_dir):
+        if filename.endswith(".json"):
+            instruction_path = os.path.join(instructions_dir, filename)
+            try:
+                with open(instruction_path, 'r') as f:
+                    instruction = json.load(f)
+                instructions.append(instruction)
+            except Exception:
+                pass
+    
+    return instructions
+
 # ==========================================
 # STEP 1: USER_INSTRUCTION
 # ==========================================
@@ -194,7 +358,8 @@ def create_instruction(
         priority: Instruction priority level
     
     Returns:
-        Dict with instruction details and unique ID
+        Dict with instruction details, unique ID and the path of the stored
+        JSON file (None when instructions are kept in memory)
     """
     logger.info(f"Creating instruction: {title}")
     
@@ -214,19 +379,15 @@ def create_instruction(
         "workflow_step": "USER_INSTRUCTION"
     }
     
-    # Save instruction to file
-    instructions_dir = os.path.join(get_project_root(), ".aerith", "instructions")
-    os.makedirs(instructions_dir, exist_ok=True)
-    
-    instruction_path = os.path.join(instructions_dir, f"{instruction_id}.json")
-    with open(instruction_path, 'w') as f:
-        json.dump(instruction, f, indent=2)
+    # Save instruction
+    storage_path = _save_instruction(instruction)
     
     return {
         "success": True,
         "instruction_id": instruction_id,
         "message": f"Instruction {instruction_id} created successfully",
-        "instruction": instruction
+        "instruction": instruction,
+        "storage_path": storage_path
     }
 
 @mcp.tool()
@@ -242,17 +403,14 @@ def get_instruction(instruction_id: str) -> Dict[str, Any]:
     """
     logger.info(f"Getting instruction: {instruction_id}")
     
-    instruction_path = os.path.join(get_project_root(), ".aerith", "instructions", f"{instruction_id}.json")
-    
-    if not os.path.exists(instruction_path):
-        return {
-            "success": False,
-            "message": f"Instruction {instruction_id} not found"
-        }
-    
     try:
-        with open(instruction_path, 'r') as f:
-            instruction = json.load(f)
+        instruction = _load_instruction(instruction_id)
+        
+        if instruction is None:
+            return {
+                "success": False,
+                "message": f"Instruction {instruction_id} not found"
+            }
         
         return {
             "success": True,
@@ -317,9 +475,7 @@ def create_task_plan(
     instruction["workflow_step"] = "TASK_PLANNING"
     
     # Save updated instruction
-    instruction_path = os.path.join(get_project_root(), ".aerith", "instructions", f"{instruction_id}.json")
-    with open(instruction_path, 'w') as f:
-        json.dump(instruction, f, indent=2)
+    _save_instruction(instruction)
     
     return {
         "success": True,
@@ -450,10 +606,8 @@ def gather_information(
     instruction["status"] = "information_gathered"
     instruction["workflow_step"] = "INFORMATION_GATHERING"
     
-    # Update instruction file
-    instruction_path = os.path.join(get_project_root(), ".aerith", "instructions", f"{instruction_id}.json")
-    with open(instruction_path, 'w') as f:
-        json.dump(instruction, f, indent=2)
+    # Save updated instruction
+    _save_instruction(instruction)
     
     return {
         "success": True,
@@ -523,10 +677,8 @@ def analyze_and_orchestrate(
     instruction["status"] = "analyzed"
     instruction["workflow_step"] = "ANALYSIS_AND_ORCHESTRATION"
     
-    # Update instruction file
-    instruction_path = os.path.join(get_project_root(), ".aerith", "instructions", f"{instruction_id}.json")
-    with open(instruction_path, 'w') as f:
-        json.dump(instruction, f, indent=2)
+    # Save updated instruction
+    _save_instruction(instruction)
     
     return {
         "success": True,
@@ -714,10 +866,8 @@ def execute_step(
     
     instruction["workflow_step"] = "RESULT_SYNTHESIS"
     
-    # Update instruction file
-    instruction_path = os.path.join(get_project_root(), ".aerith", "instructions", f"{instruction_id}.json")
-    with open(instruction_path, 'w') as f:
-        json.dump(instruction, f, indent=2)
+    # Save updated instruction
+    _save_instruction(instruction)
     
     return {
         "success": result["success"],
@@ -805,10 +955,8 @@ def generate_final_report(
     instruction["final_report"] = report
     instruction["status"] = "completed" if instruction["status"] != "failed" else "failed"
     
-    # Update instruction file
-    instruction_path = os.path.join(get_project_root(), ".aerith", "instructions", f"{instruction_id}.json")
-    with open(instruction_path, 'w') as f:
-        json.dump(instruction, f, indent=2)
+    # Save updated instruction
+    _save_instruction(instruction)
     
     return {
         "success": True,
@@ -821,6 +969,15 @@ def generate_final_report(
 # HIGHER LEVEL ORCHESTRATION
 # ==========================================
 
+# Guidance returned by build_feature for the remaining workflow steps
+_BUILD_FEATURE_NEXT_STEPS = (
+    "1. Use create_task_plan to break down this feature into subtasks",
+    "2. Use gather_information to collect necessary information for implementation",
+    "3. Use analyze_and_orchestrate to analyze the info and create an execution plan",
+    "4. Use execute_step for each step in your execution plan",
+    "5. Use generate_final_report to summarize the implementation"
+)
+
 @mcp.tool()
 def build_feature(
     title: str,
@@ -856,20 +1013,11 @@ def build_feature(
     
     instruction_id = instruction_result["instruction_id"]
     
-    # Return guidance for the next steps
-    next_steps = [
-        "1. Use create_task_plan to break down this feature into subtasks",
-        "2. Use gather_information to collect necessary information for implementation",
-        "3. Use analyze_and_orchestrate to analyze the info and create an execution plan",
-        "4. Use execute_step for each step in your execution plan",
-        "5. Use generate_final_report to summarize the implementation"
-    ]
-    
     return {
         "success": True,
         "instruction_id": instruction_id,
         "message": f"Feature '{title}' has been initialized with instruction ID: {instruction_id}",
-        "next_steps": next_steps,
+        "next_steps": list(_BUILD_FEATURE_NEXT_STEPS),
         "instruction": instruction_result["instruction"]
     }
 
@@ -891,7 +1039,7 @@ def run_browser_agent(goal: str) -> Dict[str, Any]:
     """
     logger.info(f"Running browser agent with goal: {goal}")
     try:
-        from browser_use import BrowserContext, Agent  # Import the browser-use library
+        from browser_use import BrowserContext  # Import the browser-use library
     except ImportError as e:
         logger.error("Failed to import browser-use library. Ensure it's installed.", exc_info=True)
         return {"success": False, "error": "browser-use library not installed."}
@@ -899,6 +1047,33 @@ def run_browser_agent(goal: str) -> Dict[str, Any]:
     try:
         # Initialize browser context (set headless=False if you wish to see the browser window)
         context = BrowserContext(headless=True)
+    except Exception as e:
+        logger.error(f"Error creating browser context: {str(e)}", exc_info=True)
+        return {"success": False, "error": str(e)}
+    
+    return run_agent_in_context(goal, context)
+
+def run_agent_in_context(goal: str, context: Any) -> Dict[str, Any]:
+    """
+    Run a browser-use agent for a goal inside an existing browser context.
+    
+    Lets callers that already own a browser (e.g. a shared test fixture)
+    reuse it instead of launching a new one per run.
+    
+    Args:
+        goal: The goal or query that the agent should address.
+        context: An initialized browser-use BrowserContext.
+    
+    Returns:
+        A dict with the final result of the browser automation task.
+    """
+    try:
+        from browser_use import Agent  # Import the browser-use library
+    except ImportError:
+        logger.error("Failed to import browser-use library. Ensure it's installed.", exc_info=True)
+        return {"success": False, "error": "browser-use library not installed."}
+        
+    try:
         # Create an agent with the given goal
         agent = Agent(context=context, initial_goal=goal)
         
@@ -965,23 +1140,7 @@ def get_project_structure() -> Dict[str, Any]:
 @mcp.resource("instructions://list")
 def get_instructions() -> List[Dict[str, Any]]:
     """Get list of all instructions."""
-    instructions_dir = os.path.join(get_project_root(), ".aerith", "instructions")
-    
-    if not os.path.exists(instructions_dir):
-        return []
-    
-    instructions = []
-    for filename in os.listdir(instructions_dir):
-        if filename.endswith(".json"):
-            instruction_path = os.path.join(instructions_dir, filename)
-            try:
-                with open(instruction_path, 'r') as f:
-                    instruction = json.load(f)
-                instructions.append(instruction)
-            except Exception:
-                pass
-    
-    return instructions
+    return _list_instructions()
 
 @mcp.tool()
 def tree_directory(
@@ -1175,8 +1334,140 @@ def tree_directory(
 # GIT OPERATIONS
 # ==========================================
 
+def _git_command(subcommand: str, flags: tuple = (), args: tuple = ()) -> List[str]:
+    """
+    Build a git command line.
+    
+    Args:
+        subcommand: Git subcommand, e.g. "push"
+        flags: (flag, enabled) pairs; enabled flags are added in order
+        args: Positional arguments added after the flags; empty ones are skipped
+        
+    Returns:
+        Command list for run_command
+    """
+    return ["git", subcommand] + [flag for flag, enabled in flags if enabled] + [arg for arg in args if arg]
+
+# Leading whitespace marking an entry line in `git status` output
+_WS = (b"\t", b" ")
+# Status prefixes of tracked-file entries in `git status` output
+_STATUS_PREFIXES = (b"modified:", b"new file:", b"deleted:")
+# Section headers in `git status` output and the change list they start
+_STATUS_SECTIONS = (
+    (b"Changes to be committed:", "staged"),
+    (b"Changes not staged for commit:", "not_staged"),
+    (b"Untracked files:", "untracked")
+)
+
+# Git releases before 1.8.5 prefix every `git status` line with "#"
+_STATUS_COMMENT_PREFIX_UNTIL = (1, 8, 5)
+
+@functools.lru_cache(maxsize=1)
+def _detect_git_version() -> tuple:
+    """
+    Detect the installed git version once per process.
+    
+    Returns:
+        Version as a tuple of ints, e.g. (2, 39, 5), or () if unknown
+    """
+    result = run_command(["git", "--version"], read_only=True)
+    if not result["success"]:
+        return ()
+    
+    # Example: "git version 2.39.5" or "git version 2.39.3 (Apple Git-146)"
+    words = result["output"].split()
+    if len(words) < 3:
+        return ()
+    version = []
+    for part in words[2].split("."):
+        if not part.isdigit():
+            break
+        version.append(int(part))
+    return tuple(version)
+
+@functools.lru_cache(maxsize=None)
+def _make_status_parser(git_version: tuple):
+    """
+    Build a `git status` parser specialized for the given git version.
+    
+    Everything that does not change between calls (section headers, prefixes,
+    whether lines carry the legacy "#" comment prefix) is bound once as closure
+    constants, so the returned function only touches locals while scanning.
+    
+    The parser locates lines with offsets into the raw bytes rather than
+    splitting them into strings; only the branch name and file names that end
+    up in the result are decoded.
+    """
+    strip_comments = bool(git_version) and git_version < _STATUS_COMMENT_PREFIX_UNTIL
+    ws = _WS
+    status_prefixes = _STATUS_PREFIXES
+    sections = _STATUS_SECTIONS
+    branch_prefix = b"On branch "
+    branch_prefix_len = len(branch_prefix)
+    
+    def parse_status(output: bytes) -> Dict[str, Any]:
+        find = output.find
+        startswith = output.startswith
+        view = memoryview(output)
+        branch = None
+        changes = {"staged": [], "not_staged": [], "untracked": []}
+        current_section = None
+        
+        pos = 0
+        size = len(output)
+        while pos < size:
+            end = find(b"\n", pos)
+            if end == -1:
+                end = size
+            next_pos = end + 1
+            if end > pos and output[end - 1] == 0x0D:  # tolerate \r\n
+                end -= 1
+            
+            if strip_comments and startswith(b"#", pos, end):
+                pos += 2 if startswith(b"# ", pos, end) else 1
+            
+            # Section headers are the only unindented lines we care about
+            if not startswith(ws, pos, end):
+                if branch is None and startswith(branch_prefix, pos, end):
+                    branch = str(view[pos + branch_prefix_len:end], "utf-8", "replace").strip()
+                else:
+                    for header, section in sections:
+                        if startswith(header, pos, end):
+                            current_section = section
+                            break
+                pos = next_pos
+                continue
+            
+            # Skip the indentation, blank lines and the "(use ...)" hints
+            start = pos
+            while start < end and output[start] in (0x09, 0x20):
+                start += 1
+            pos = next_pos
+            if start == end or output[start] == 0x28 or not current_section:
+                continue
+            
+            if startswith(status_prefixes, start, end):
+                colon = find(b":", start, end)
+                file_start = colon + 1
+                while file_start < end and output[file_start] == 0x20:
+                    file_start += 1
+                changes[current_section].append({
+                    "status": str(view[start:colon], "utf-8"),
+                    "file": str(view[file_start:end], "utf-8", "replace")
+                })
+            elif current_section == "untracked":
+                # Handle untracked files which don't have a status prefix
+                changes["untracked"].append({
+                    "status": "untracked",
+                    "file": str(view[start:end], "utf-8", "replace").rstrip()
+                })
+        
+        return {"branch": branch, "changes": changes}
+    
+    return parse_status
+
 @mcp.tool()
-def git_status(
+async def git_status(
     detailed: bool = False
 ) -> Dict[str, Any]:
     """
@@ -1194,7 +1485,8 @@ def git_status(
     if detailed:
         cmd.append("--untracked-files=all")
     
-    result = run_command(cmd)
+    result = await run_command_async(cmd, read_only=True, text=False)
+    output = result["output"]
     
     # Parse the output into structured information
     status_info = {
@@ -1205,45 +1497,15 @@ def git_status(
             "not_staged": [],
             "untracked": []
         },
-        "raw_output": result["output"]
+        "raw_output": output.decode("utf-8", "replace")
     }
     
     if result["success"]:
-        lines = result["output"].splitlines()
-        
-        # Extract branch info
-        for line in lines:
-            if "On branch " in line:
-                status_info["branch"] = line.replace("On branch ", "").strip()
-                break
+        parse_status = _make_status_parser(_detect_git_version())
+        status_info.update(parse_status(output))
         
         # Check if working directory is clean
-        status_info["is_clean"] = "nothing to commit, working tree clean" in result["output"]
-        
-        # Extract changed files
-        current_section = None
-        for line in lines:
-            line = line.strip()
-            
-            if "Changes to be committed:" in line:
-                current_section = "staged"
-            elif "Changes not staged for commit:" in line:
-                current_section = "not_staged"
-            elif "Untracked files:" in line:
-                current_section = "untracked"
-            elif line.startswith("modified:") or line.startswith("new file:") or line.startswith("deleted:"):
-                parts = line.split(":", 1)
-                if len(parts) > 1 and current_section:
-                    status_info["changes"][current_section].append({
-                        "status": parts[0].strip(),
-                        "file": parts[1].strip()
-                    })
-            elif line and line[0] in ["\t", " "] and current_section == "untracked":
-                # Handle untracked files which don't have a status prefix
-                status_info["changes"]["untracked"].append({
-                    "status": "untracked",
-                    "file": line.strip()
-                })
+        status_info["is_clean"] = b"nothing to commit, working tree clean" in output
     
     return {
         "success": result["success"],
@@ -1252,7 +1514,7 @@ def git_status(
     }
 
 @mcp.tool()
-def git_log(
+async def git_log(
     count: int = 10,
     show_stats: bool = False,
     path: str = "",
@@ -1294,7 +1556,7 @@ def git_log(
         cmd.append("--")
         cmd.append(path)
     
-    result = run_command(cmd)
+    result = await run_command_async(cmd, read_only=True)
     
     commits = []
     if result["success"]:
@@ -1352,21 +1614,43 @@ def git_log(
         "raw_output": result["output"] if not result["success"] else ""
     }
 
+def _parse_shortstat(output: str) -> Dict[str, int]:
+    """Parse `git diff --shortstat` output, e.g. " 2 files changed, 5 insertions(+), 1 deletion(-)"."""
+    summary = {"files": 0, "insertions": 0, "deletions": 0}
+    for part in output.split(","):
+        words = part.split()
+        if len(words) < 2 or not words[0].isdigit():
+            continue
+        if words[1].startswith("file"):
+            summary["files"] = int(words[0])
+        elif words[1].startswith("insertion"):
+            summary["insertions"] = int(words[0])
+        elif words[1].startswith("deletion"):
+            summary["deletions"] = int(words[0])
+    return summary
+
 @mcp.tool()
-def git_diff(
+async def git_diff(
     file_path: str = "",
     staged: bool = False,
     commit: str = "",
-    compare_with: str = ""
+    compare_with: str = "",
+    max_bytes: int = 1024 * 1024
 ) -> Dict[str, Any]:
     """
     Show changes between commits, commit and working tree, etc.
     
+    Diffs larger than max_bytes are re-run with one line of context, which the
+    summary flags as context_reduced; if that is still too large the output is
+    cut at max_bytes and flagged as truncated. Either way the summary holds the
+    exact totals from `git diff --shortstat`.
+    
     Args:
         file_path: Specific file to show diff for (empty for all files)
         staged: Whether to show staged changes
         commit: Specific commit to show diff for
         compare_with: Compare with another commit
+        max_bytes: Maximum diff output to read (0 for no limit)
         
     Returns:
         Dict with the diff information
@@ -1387,7 +1671,21 @@ def git_diff(
         cmd.append("--")
         cmd.append(file_path)
     
-    result = run_command(cmd)
+    limit = max_bytes or None
+    result = await run_command_async(cmd, read_only=True, max_bytes=limit)
+    context_lines = 3
+    shortstat = None
+    
+    if result["truncated"]:
+        # Too large: retry with minimal context and fetch exact totals alongside
+        logger.info(f"Diff exceeds {max_bytes} bytes, retrying with -U1")
+        reduced_cmd = cmd[:2] + ["-U1"] + cmd[2:]
+        stat_cmd = cmd[:2] + ["--shortstat"] + cmd[2:]
+        result, shortstat = await asyncio.gather(
+            run_command_async(reduced_cmd, read_only=True, max_bytes=limit),
+            run_command_async(stat_cmd, read_only=True)
+        )
+        context_lines = 1
     
     # Parse the diff output to get structured information
     files_changed = []
@@ -1453,13 +1751,29 @@ def git_diff(
             
             files_changed.append(file_info)
     
+    if shortstat is not None and shortstat["success"]:
+        summary = _parse_shortstat(shortstat["output"])
+    else:
+        summary = {
+            "files": len(files_changed),
+            "insertions": sum(f["changes"]["insertions"] for f in files_changed),
+            "deletions": sum(f["changes"]["deletions"] for f in files_changed)
+        }
+    summary["truncated"] = result["truncated"]
+    summary["context_reduced"] = shortstat is not None
+    summary["context_lines"] = context_lines
+    
     return {
         "success": result["success"],
         "message": f"Diff shows {len(files_changed)} files changed" if result["success"] else f"Error: {result['error']}",
         "files_changed": files_changed,
+        "summary": summary,
         "raw_output": result["output"]
     }
 
+# for-each-ref format for branch listing, fields separated by US (\x1f)
+_BRANCH_FORMAT = "--format=%(refname:short)%1f%(HEAD)%1f%(refname:rstrip=-2)"
+
 @mcp.tool()
 def git_branch(
     create: bool = False,
@@ -1498,49 +1812,57 @@ def git_branch(
         }
     
     if create:
-        cmd = ["git", "branch", branch_name]
+        cmd = _git_command("branch", (), (branch_name,))
         if base_branch:
-            cmd = ["git", "checkout", "-b", branch_name, base_branch]
+            cmd = _git_command("checkout", (("-b", True),), (branch_name, base_branch))
     elif delete:
-        cmd = ["git", "branch", "-d", branch_name]
+        cmd = _git_command("branch", (("-d", True),), (branch_name,))
     else:
-        # List branches
-        cmd = ["git", "branch"]
-        if remote:
-            cmd.append("-a")
+        # List branches as machine-readable records: short name, HEAD marker
+        # and the ref namespace ("refs/heads" or "refs/remotes")
+        cmd = _git_command(
+            "for-each-ref",
+            ((_BRANCH_FORMAT, True),),
+            ("refs/heads", "refs/remotes" if remote else "")
+        )
     
-    result = run_command(cmd)
+    result = run_command(cmd, read_only=not (create or delete))
     
     branches = []
     current_branch = None
+    # Listing in the `git branch` layout, as returned before for-each-ref
+    listing = []
     
     if result["success"] and not (create or delete):
-        # Parse branch list
-        for line in result["output"].splitlines():
-            line = line.strip()
-            if not line:
+        # Parse branch records
+        for record in result["output"].split("\n"):
+            if not record:
                 continue
-                
-            is_current = False
-            if line.startswith("*"):
-                is_current = True
-                line = line[1:].strip()
-                current_branch = line
             
-            branch_type = "local"
-            if line.startswith("remotes/"):
-                branch_type = "remote"
-                line = line[8:]  # Remove "remotes/"
+            name, _, rest = record.partition("\x1f")
+            head, _, namespace = rest.partition("\x1f")
+            is_current = head == "*"
+            if is_current:
+                current_branch = name
             
+            is_remote = namespace == "refs/remotes"
             branches.append({
-                "name": line,
+                "name": name,
                 "is_current": is_current,
-                "type": branch_type
+                "type": "remote" if is_remote else "local"
             })
+            listing.append(f"{'*' if is_current else ' '} {'remotes/' if is_remote else ''}{name}\n")
+    
+    if not result["success"]:
+        message = f"Error: {result['error']}"
+    elif create or delete:
+        message = result["output"]
+    else:
+        message = "".join(listing)
     
     return {
         "success": result["success"],
-        "message": result["output"] if result["success"] else f"Error: {result['error']}",
+        "message": message,
         "branches": branches,
         "current_branch": current_branch
     }
@@ -1564,15 +1886,8 @@ def git_checkout(
     """
     logger.info(f"Running git checkout to {branch_name}")
     
-    cmd = ["git", "checkout"]
-    
-    if create:
-        cmd.append("-b")
-    
-    if force:
-        cmd.append("-f")
-    
-    cmd.append(branch_name)
+    # -f goes first: -b takes the branch name as its value
+    cmd = _git_command("checkout", (("-f", force), ("-b", create)), (branch_name,))
     
     result = run_command(cmd)
     
@@ -1582,6 +1897,8 @@ def git_checkout(
         "branch": branch_name if result["success"] else None
     }
 
+_HEX_DIGITS = frozenset("0123456789abcdef")
+
 @mcp.tool()
 def git_commit(
     message: str,
@@ -1608,32 +1925,26 @@ def git_commit(
             "commit_id": None
         }
     
-    cmd = ["git", "commit"]
-    
-    if all_changes:
-        cmd.append("-a")
-    
-    if amend:
-        cmd.append("--amend")
-        if message:
-            cmd.extend(["-m", message])
-        else:
-            cmd.append("--no-edit")
-    else:
+    cmd = _git_command("commit", (
+        ("-a", all_changes),
+        ("--amend", amend),
+        ("--no-edit", amend and not message)
+    ))
+    if message:
         cmd.extend(["-m", message])
     
     result = run_command(cmd)
     
-    # Extract commit hash from output
+    # Ask git for the new commit hash instead of parsing the (translated) summary line
     commit_id = None
     if result["success"]:
-        for line in result["output"].splitlines():
-            if line.startswith("[") and "]" in line and "commit" in line:
-                # Example: [master abcd123] Commit message
-                parts = line.split()
-                if len(parts) >= 2:
-                    commit_id = parts[1][:-1]  # Remove the trailing ]
-                break
+        hash_result = run_command(["git", "rev-parse", "HEAD"], read_only=True)
+        if hash_result["success"]:
+            commit_id = hash_result["output"].strip()
+            # Guard against anything that isn't a plain SHA-1/SHA-256 hex digest
+            if not (len(commit_id) in (40, 64) and all(c in _HEX_DIGITS for c in commit_id)):
+                logger.warning(f"Unexpected rev-parse output: {commit_id!r}")
+                commit_id = None
     
     return {
         "success": result["success"],
@@ -1662,16 +1973,7 @@ def git_push(
     """
     logger.info(f"Running git push to {remote}")
     
-    cmd = ["git", "push", remote]
-    
-    if branch:
-        cmd.append(branch)
-    
-    if force:
-        cmd.append("--force")
-    
-    if tags:
-        cmd.append("--tags")
+    cmd = _git_command("push", (("--force", force), ("--tags", tags)), (remote, branch))
     
     result = run_command(cmd)
     
@@ -1701,15 +2003,7 @@ def git_pull(
     """
     logger.info(f"Running git pull from {remote}")
     
-    cmd = ["git", "pull"]
-    
-    if rebase:
-        cmd.append("--rebase")
-    
-    cmd.append(remote)
-    
-    if branch:
-        cmd.append(branch)
+    cmd = _git_command("pull", (("--rebase", rebase),), (remote, branch))
     
     result = run_command(cmd)
     
@@ -1757,6 +2051,59 @@ def git_add(
 # SERVER STARTUP
 # ==========================================
 
+def run_http_server(port: Optional[int] = None) -> None:
+    """Serve the MCP SSE app over HTTP with uvicorn, retrying on failure."""
+    try:
+        host = "0.0.0.0"  # Listen on all interfaces
+        port = port or 8090  # Default port
+        
+        logger.info(f"Starting MCP server on {host}:{port}")
+        
+        app = mcp.sse_app()
+        
+        # Add restart capability with retry logic
+        max_retries = 5
+        retry_count = 0
+        
+        while retry_count < max_retries:
+            try:
+                import uvicorn
+                logger.info(f"Starting HTTP server attempt {retry_count + 1}/{max_retries}")
+                uvicorn.run(
+                    app, 
+                    host=host, 
+                    port=port,
+                    log_level="info"
+                )
+                # If uvicorn exits normally (unlikely), break out of the retry loop
+                logger.info("HTTP server exited normally")
+                break
+            except Exception as e:
+                retry_count += 1
+                logger.error(f"Error in HTTP server (attempt {retry_count}/{max_retries}): {e}", exc_info=True)
+                
+                if retry_count >= max_retries:
+                    logger.error(f"Maximum retry attempts ({max_retries}) reached. Giving up.")
+                    break
+                
+                # Exponential backoff for retries
+                wait_time = 2 ** retry_count
+                logger.info(f"Waiting {wait_time} seconds before restarting server...")
+                time.sleep(wait_time)
+        
+        # If we've exhausted retries, enter a keep-alive loop anyway
+        # This gives the operator a chance to fix the issue while the process remains alive
+        if retry_count >= max_retries:
+            logger.info("Entering emergency keep-alive loop after exhausting HTTP retries")
+            while True:
+                time.sleep(10)  # Check less frequently in this emergency mode
+                logger.info("MCP server in emergency mode. Restart the process to try again.")
+                
+    except Exception as e:
+        logger.error(f"Critical error running MCP server in HTTP mode: {e}", exc_info=True)
+        logger.error("Server will now terminate due to critical error")
+        sys.exit(1)
+
 if __name__ == "__main__":
     # Parse command line arguments
     port = None
@@ -1776,15 +2123,16 @@ if __name__ == "__main__":
             logger.info(f"Python executable: {sys.executable}")
             logger.info(f"Arguments: {sys.argv}")
             logger.info(f"Current working directory: {os.getcwd()}")
-            logger.info("Environment variables:")
-            for key, value in sorted(os.environ.items()):
-                if key.startswith("PYTHON") or key.startswith("MCP"):
-                    logger.info(f"  {key}={value}")
-            
-            logger.info(f"stdin isatty: {sys.stdin.isatty()}")
-            logger.info(f"stdout isatty: {sys.stdout.isatty()}")
-            
-            import asyncio
+            debug_mode = os.environ.get("MCP_DEBUG") == "true"
+            if debug_mode:
+                logger.info("Environment variables:")
+                for key in _DEBUG_ENV_VARS:
+                    value = os.environ.get(key)
+                    if value is not None:
+                        logger.info(f"  {key}={value}")
+                
+                logger.info(f"stdin isatty: {sys.stdin.isatty()}")
+                logger.info(f"stdout isatty: {sys.stdout.isatty()}")
             
             logger.info("Testing if stderr is working (this should appear in logs)")
             logger.info("About to write a test message to stdout (for JSON-RPC protocol)")
@@ -1794,14 +2142,15 @@ if __name__ == "__main__":
             sys.stdout.flush()
             logger.info("Test message written to stdout")
             
-            if os.environ.get("MCP_DEBUG") == "true":
+            if debug_mode:
                 logger.info("Enabling asyncio debug mode")
                 asyncio.get_event_loop().set_debug(True)
             
             stdin_has_buffer = hasattr(sys.stdin, 'buffer')
             stdout_has_buffer = hasattr(sys.stdout, 'buffer')
-            logger.info(f"sys.stdin has buffer: {stdin_has_buffer}, type: {type(sys.stdin)}")
-            logger.info(f"sys.stdout has buffer: {stdout_has_buffer}, type: {type(sys.stdout)}")
+            if debug_mode:
+                logger.info(f"sys.stdin has buffer: {stdin_has_buffer}, type: {type(sys.stdin)}")
+                logger.info(f"sys.stdout has buffer: {stdout_has_buffer}, type: {type(sys.stdout)}")
             
             if not stdin_has_buffer or not stdout_has_buffer:
                 logger.error("stdin/stdout don't have buffer attributes, which is required for stdio mode")
@@ -1862,53 +2211,4 @@ if __name__ == "__main__":
             sys.exit(1)
     else:
         # Run in HTTP mode
-        try:
-            host = "0.0.0.0"  # Listen on all interfaces
-            port = port or 8090  # Default port
-            
-            logger.info(f"Starting MCP server on {host}:{port}")
-            
-            app = mcp.sse_app()
-            
-            # Add restart capability with retry logic
-            max_retries = 5
-            retry_count = 0
-            
-            while retry_count < max_retries:
-                try:
-                    import uvicorn
-                    logger.info(f"Starting HTTP server attempt {retry_count + 1}/{max_retries}")
-                    uvicorn.run(
-                        app, 
-                        host=host, 
-                        port=port,
-                        log_level="info"
-                    )
-                    # If uvicorn exits normally (unlikely), break out of the retry loop
-                    logger.info("HTTP server exited normally")
-                    break
-                except Exception as e:
-                    retry_count += 1
-                    logger.error(f"Error in HTTP server (attempt {retry_count}/{max_retries}): {e}", exc_info=True)
-                    
-                    if retry_count >= max_retries:
-                        logger.error(f"Maximum retry attempts ({max_retries}) reached. Giving up.")
-                        break
-                    
-                    # Exponential backoff for retries
-                    wait_time = 2 ** retry_count
-                    logger.info(f"Waiting {wait_time} seconds before restarting server...")
-                    time.sleep(wait_time)
-            
-            # If we've exhausted retries, enter a keep-alive loop anyway
-            # This gives the operator a chance to fix the issue while the process remains alive
-            if retry_count >= max_retries:
-                logger.info("Entering emergency keep-alive loop after exhausting HTTP retries")
-                while True:
-                    time.sleep(10)  # Check less frequently in this emergency mode
-                    logger.info("MCP server in emergency mode. Restart the process to try again.")
-                    
-        except Exception as e:
-            logger.error(f"Critical error running MCP server in HTTP mode: {e}", exc_info=True)
-            logger.error("Server will now terminate due to critical error")
-            sys.exit(1)
+        run_http_server(port)
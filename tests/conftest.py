@@ -3,15 +3,47 @@ Pytest configuration file for Aerith Admin MCP server tests.
 This file contains shared fixtures and configuration for all tests.
 """
 import os
+import re
 import sys
+import time
+import shutil
+import signal
+import tempfile
+import contextlib
+import subprocess
 import pytest
 import logging
+from pathlib import Path
+
+# Add the project root and the mcp directory to sys.path at import time.
+# conftest is imported before collection, so test modules can import
+# server at module level without relying on fixture ordering.
+def add_mcp_to_path():
+    """Ensure MCP module is in the Python path."""
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+    
+    # Also add the mcp directory itself
+    mcp_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    if mcp_dir not in sys.path:
+        sys.path.insert(0, mcp_dir)
+
+add_mcp_to_path()
 
 # Register custom markers
 def pytest_configure(config):
     """Register custom pytest markers."""
     config.addinivalue_line("markers", "slow: marks tests as slow (deselect with '-m \"not slow\"')")
     config.addinivalue_line("markers", "browser: marks tests that require browser automation (deselect with '-m \"not browser\"')")
+    config.addinivalue_line("markers", "serial: marks tests that must not run in parallel (run with '-n 0 -m serial')")
+
+# Don't even import the process tests in tests/slow while slow tests are deselected
+def pytest_ignore_collect(collection_path, config):
+    """Skip collecting tests/slow when the marker expression excludes slow tests."""
+    if collection_path.name == "slow" and "not slow" in (config.getoption("markexpr") or ""):
+        return True
+    return None
 
 # Configure logging for tests
 @pytest.fixture(scope="session", autouse=True)
@@ -28,59 +60,310 @@ def configure_logging():
     # Suppress excessive logging during tests
     logging.getLogger("urllib3").setLevel(logging.WARNING)
     logging.getLogger("asyncio").setLevel(logging.WARNING)
+
+# Directory of static test assets committed to the repository
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Hard-link a fixture asset into a test directory, copying across filesystems
+def link_fixture(source, target):
+    """Place source at target with os.link, falling back to a copy."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+# Per-test project directory with the layout the workflow tools expect
+@pytest.fixture
+def aerith_tmp(tmp_path):
+    """Create the .aerith/instructions and src/components directories in tmp_path."""
+    (tmp_path / ".aerith" / "instructions").mkdir(parents=True)
+    (tmp_path / "src" / "components").mkdir(parents=True)
+    return tmp_path
+
+# Working directory the session started in; get_project_root() follows the cwd
+@pytest.fixture(scope="session")
+def project_root_cached():
+    """The session's starting working directory, computed once."""
+    return Path(os.getcwd())
+
+# Run a test inside its tmp_path; monkeypatch restores the cwd afterwards
+@pytest.fixture
+def tmp_chdir(tmp_path, monkeypatch):
+    """Change into tmp_path for the duration of the test and return it."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+# One numbered base directory per session; per-test directories are plain mkdirs
+@pytest.fixture(scope="session")
+def _base_tmp(tmp_path_factory):
+    """Session-wide base directory for fast_tmp."""
+    return tmp_path_factory.mktemp("utils_suite")
+
+@pytest.fixture
+def fast_tmp(_base_tmp, request):
+    """
+    Per-test directory under a shared session base.
     
-    logger = logging.getLogger("aerith-test")
-    logger.info("Test logging configured")
+    Cheaper than tmp_path for small tests, since pytest's numbered-directory
+    scan and cleanup runs once per session instead of once per test.
+    """
+    # mkdtemp adds a unique suffix, so reruns and tests that share a name in
+    # different modules never collide
+    prefix = re.sub(r"[^\w.-]", "_", request.node.name)[:30] + "-"
+    return Path(tempfile.mkdtemp(prefix=prefix, dir=_base_tmp))
 
-# Add the project root to sys.path if needed
-@pytest.fixture(scope="session", autouse=True)
-def add_mcp_to_path():
-    """Ensure MCP module is in the Python path."""
-    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
-    if project_root not in sys.path:
-        sys.path.insert(0, project_root)
+# A directory without write permission, created once per session
+@pytest.fixture(scope="session")
+def readonly_dir(tmp_path_factory):
+    """Session-wide read-only (0o555) directory; permissions are restored for cleanup."""
+    path = tmp_path_factory.mktemp("readonly")
+    os.chmod(path, 0o555)  # read and execute only
+    yield path
+    os.chmod(path, 0o755)
+
+# Sample React component used by the workflow tests
+@pytest.fixture(scope="session")
+def button_component_repo():
+    """Path to the committed tests/fixtures/Button.tsx asset."""
+    return os.path.join(FIXTURES_DIR, "Button.tsx")
+
+# The FastMCP instance is built when server is first imported; share it
+@pytest.fixture(scope="session")
+def mcp_instance():
+    """The server's FastMCP instance, shared by every test in the session."""
+    import server
+    return server.mcp
+
+# Keep instructions in memory instead of JSON files for a whole module
+@pytest.fixture(scope="module")
+def memory_instruction_store():
+    """Switch the server to the in-memory instruction store (AERITH_STORE=memory)."""
+    import server
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("AERITH_STORE", "memory")
+        yield server._memory_instructions
+    server._memory_instructions.clear()
+
+# Store pre-built instructions so a workflow step can be tested on its own
+@pytest.fixture
+def seed_instruction(memory_instruction_store):
+    """
+    Factory that saves an instruction in the in-memory store and returns its id.
     
-    # Also add the mcp directory itself
-    mcp_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-    if mcp_dir not in sys.path:
-        sys.path.insert(0, mcp_dir)
+    Keyword arguments override or add instruction fields, e.g. to start
+    from a later workflow step.
+    """
+    from server import _save_instruction
+    
+    def seed(**fields):
+        instruction = {
+            "id": "seed0001",
+            "title": "Update button component",
+            "description": "Update the Button component to support different sizes",
+            "goal": "Enhance Button component with size variants",
+            "priority": "medium",
+            "status": "created",
+            "created_at": 1234567890,
+            "workflow_step": "USER_INSTRUCTION"
+        }
+        instruction.update(fields)
+        _save_instruction(instruction)
+        return instruction["id"]
+    
+    return seed
+
+# Mock browser context and agent classes, defined once at import time
+class MockBrowserContext:
+    def __init__(self, headless=True):
+        self.headless = headless
+        
+    def navigate(self, url):
+        return {"success": True, "url": url}
+        
+    def click(self, selector):
+        return {"success": True, "selector": selector}
+        
+    def type(self, selector, text):
+        return {"success": True, "selector": selector, "text": text}
+        
+    def get_content(self):
+        return "<html><body>Mock content</body></html>"
+
+class MockAgent:
+    def __init__(self, context, initial_goal):
+        self.context = context
+        self.goal = initial_goal
+        
+    def run(self):
+        return {
+            "success": True,
+            "goal": self.goal,
+            "result": "Mock result for browser automation"
+        }
 
 # Mock dependencies for browser automation
 @pytest.fixture
 def mock_browser_context():
     """Mock browser context for testing browser automation."""
-    class MockBrowserContext:
-        def __init__(self, headless=True):
-            self.headless = headless
-            
-        def navigate(self, url):
-            return {"success": True, "url": url}
-            
-        def click(self, selector):
-            return {"success": True, "selector": selector}
-            
-        def type(self, selector, text):
-            return {"success": True, "selector": selector, "text": text}
-            
-        def get_content(self):
-            return "<html><body>Mock content</body></html>"
-    
     return MockBrowserContext
 
+# Launch Chromium with remote debugging and return the CDP WebSocket URL
+def _launch_chromium(user_data_dir, timeout=30):
+    """Start a headless Chromium and wait for its DevTools endpoint."""
+    for name in ("chromium", "chromium-browser", "google-chrome"):
+        executable = shutil.which(name)
+        if executable:
+            break
+    else:
+        pytest.skip("Chromium is not installed")
+    
+    # stderr goes to a file rather than a pipe nobody drains, which would
+    # eventually block Chromium once the pipe buffer fills up
+    user_data_dir = Path(user_data_dir)
+    user_data_dir.mkdir(parents=True, exist_ok=True)
+    log_path = user_data_dir / "chromium-stderr.log"
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(
+            [executable, "--headless=new", "--remote-debugging-port=0", f"--user-data-dir={user_data_dir}"],
+            stdout=subprocess.DEVNULL,
+            stderr=log
+        )
+    
+    # Chromium announces the endpoint on stderr once it is ready
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for line in log_path.read_text(errors="replace").splitlines():
+            if line.startswith("DevTools listening on "):
+                return process, line.split(" on ", 1)[1].strip()
+        if process.poll() is not None:
+            pytest.skip("Chromium exited before exposing a CDP endpoint")
+        time.sleep(0.1)
+    process.kill()
+    process.wait()
+    pytest.skip("Chromium did not expose a CDP endpoint in time")
+
+# Cross-worker mutex: whoever creates the lock file holds it
+@contextlib.contextmanager
+def _file_lock(lock_path, timeout=60):
+    """Hold an O_EXCL lock file for the duration of the block."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL))
+            break
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                pytest.skip(f"Timed out waiting for {lock_path.name}")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.unlink(lock_path)
+
+# Share one Chromium across all xdist workers through its CDP endpoint
+@pytest.fixture(scope="session")
+def cdp_url(tmp_path_factory, worker_id):
+    """
+    CDP WebSocket URL of a single headless Chromium for the test session.
+    
+    Without xdist the browser is launched directly. Under xdist the workers
+    reference-count the browser in the shared base temp directory: each one
+    registers a marker file while it uses the browser, the first to register
+    launches it and the last to leave shuts it down. Both steps happen under
+    a lock file, so a worker that arrives after the browser was shut down
+    launches a new one.
+    """
+    if worker_id == "master":
+        process, url = _launch_chromium(tmp_path_factory.mktemp("chromium"))
+        yield url
+        process.terminate()
+        process.wait()
+        return
+    
+    shared_dir = tmp_path_factory.getbasetemp().parent
+    lock_path = shared_dir / "cdp_url.lock"
+    endpoint_file = shared_dir / "cdp_url"
+    pid_file = shared_dir / "cdp_url.pid"
+    users_dir = shared_dir / "cdp_users"
+    
+    process = None
+    with _file_lock(lock_path):
+        users_dir.mkdir(exist_ok=True)
+        if not endpoint_file.exists():
+            process, url = _launch_chromium(shared_dir / "chromium")
+            endpoint_file.write_text(url)
+            pid_file.write_text(str(process.pid))
+        (users_dir / worker_id).touch()
+        url = endpoint_file.read_text()
+    
+    yield url
+    
+    with _file_lock(lock_path):
+        (users_dir / worker_id).unlink()
+        if any(users_dir.iterdir()):
+            return
+        # Last worker out: shut the browser down
+        pid = int(pid_file.read_text())
+        endpoint_file.unlink()
+        pid_file.unlink()
+        if process is not None and process.pid == pid:
+            process.terminate()
+            process.wait()
+        else:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+# Browser contexts on the shared Chromium, one per test
+class BrowserPool:
+    """
+    Hand out a fresh browser context per test and close it on release.
+    
+    Contexts are created by `factory` on the shared Chromium, so tests reuse
+    one browser process without sharing cookies, pages or storage.
+    """
+    def __init__(self, factory):
+        self._factory = factory
+        self._open = []
+    
+    def acquire(self):
+        context = self._factory()
+        self._open.append(context)
+        return context
+    
+    def release(self, context):
+        self._open.remove(context)
+        close = getattr(context, "close", None)
+        if close is not None:
+            close()
+    
+    def close(self):
+        for context in list(self._open):
+            self.release(context)
+
+# Share one real browser across the actual browser automation tests
+@pytest.fixture(scope="session")
+def browser_pool(request):
+    """Session-wide source of browser contexts on the shared Chromium."""
+    browser_use = pytest.importorskip("browser_use")
+    # Resolved lazily so Chromium is never launched when browser-use is missing
+    cdp_url = request.getfixturevalue("cdp_url")
+    pool = BrowserPool(lambda: browser_use.BrowserContext(headless=True, cdp_url=cdp_url))
+    yield pool
+    pool.close()
+
+@pytest.fixture
+def isolated_browser(browser_pool):
+    """Create a fresh browser context for one test and close it afterwards."""
+    context = browser_pool.acquire()
+    try:
+        yield context
+    finally:
+        browser_pool.release(context)
+
 # Create a mock Agent for browser automation
 @pytest.fixture
-def mock_browser_agent(mock_browser_context):
+def mock_browser_agent():
     """Mock Agent for testing browser automation."""
-    class MockAgent:
-        def __init__(self, context, initial_goal):
-            self.context = context
-            self.goal = initial_goal
-            
-        def run(self):
-            return {
-                "success": True,
-                "goal": self.goal,
-                "result": "Mock result for browser automation"
-            }
-    
-    return MockAgent 
\ No newline at end of file
+    return MockAgent
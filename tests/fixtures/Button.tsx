@@ -0,0 +1,16 @@
+import React from 'react';
+
+interface ButtonProps {
+    text: string;
+    onClick?: () => void;
+}
+
+const Button: React.FC<ButtonProps> = ({ text, onClick }) => {
+    return (
+        <button onClick={onClick} className="btn">
+            {text}
+        </button>
+    );
+};
+
+export default Button;
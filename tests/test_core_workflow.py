@@ -3,10 +3,8 @@
 Core workflow tests for the Aerith Admin MCP server.
 These tests validate each step of the Manus-inspired 5-step workflow.
 """
-import os
-import json
-import sys
 import pytest
+import copy
 from pathlib import Path
 
 # Import the functions we need for testing
@@ -18,21 +16,84 @@ from server import (
     analyze_and_orchestrate, 
     execute_step, 
     generate_final_report,
-    build_feature
+    build_feature,
+    get_instructions
 )
 
-# Import test fixture
-from conftest import add_mcp_to_path
+from conftest import link_fixture
 
+# Sample inputs shared by the step tests and the end-to-end test
+SUBTASKS = [
+    {
+        "id": "st-1",
+        "title": "Analyze current Button implementation",
+        "description": "Review existing Button component code",
+        "complexity": 1
+    },
+    {
+        "id": "st-2",
+        "title": "Add size property",
+        "description": "Implement size property and CSS classes",
+        "complexity": 2,
+        "dependencies": ["st-1"]
+    },
+    {
+        "id": "st-3",
+        "title": "Document size variants",
+        "description": "Describe the new sizes in the README",
+        "complexity": 1,
+        "dependencies": ["st-2"]
+    }
+]
 
+ANALYSIS = {
+    "findings": [
+        "Button has no size property",
+        "README needs a section on size variants"
+    ],
+    "recommendations": ["Add small, medium and large CSS classes"],
+    "decision_points": [
+        {"question": "Should medium be the default size?", "decision": "Yes"}
+    ]
+}
+
+EXECUTION_PLAN = [
+    {
+        "id": "step-1",
+        "title": "Update README.md",
+        "type": "file_modification",
+        "description": "Document the Button size variants"
+    },
+    {
+        "id": "step-2",
+        "title": "Add size classes",
+        "type": "file_modification",
+        "description": "Add the size CSS classes to Button"
+    }
+]
+
+README_CONTENT = "# Test Project\n\n## Components\n\n### Button\n\nButton supports small, medium and large sizes."
+
+
+@pytest.mark.usefixtures("memory_instruction_store")
 class TestCoreWorkflow:
-    """Test class for the core 5-step workflow."""
+    """Test class for the core 5-step workflow.
+    
+    Instructions are kept in memory; test_create_instruction also runs
+    against the file store to cover JSON serialization. Each step is tested on
+    its own against a seeded instruction; test_full_workflow_e2e runs the
+    whole chain once.
+    """
     
-    def test_create_instruction(self, tmpdir):
+    @pytest.fixture(autouse=True)
+    def _cd_tmp(self, aerith_tmp, monkeypatch):
+        """Run every test from its own prepared project directory."""
+        monkeypatch.chdir(aerith_tmp)
+    
+    @pytest.mark.parametrize("store", ["file", "memory"])
+    def test_create_instruction(self, monkeypatch, store):
         """Test step 1: USER_INSTRUCTION - Creating a new instruction."""
-        # Set up test environment
-        os.chdir(tmpdir)
-        os.makedirs(os.path.join(tmpdir, ".aerith", "instructions"), exist_ok=True)
+        monkeypatch.setenv("AERITH_STORE", store)
         
         # Create a new instruction
         result = create_instruction(
@@ -48,56 +109,22 @@ class TestCoreWorkflow:
         assert result["instruction"]["title"] == "Add dark mode toggle"
         assert result["instruction"]["workflow_step"] == "USER_INSTRUCTION"
         
-        # Verify the file was created
-        instruction_path = os.path.join(".aerith", "instructions", f"{result['instruction_id']}.json")
-        assert os.path.exists(instruction_path)
+        # Verify the instruction was stored
+        if store == "file":
+            assert result["storage_path"] and Path(result["storage_path"]).exists()
+        else:
+            assert result["storage_path"] is None
         
         # Verify get_instruction works
         get_result = get_instruction(result["instruction_id"])
         assert get_result["success"] is True
         assert get_result["instruction"]["id"] == result["instruction_id"]
     
-    def test_create_task_plan(self, tmpdir):
+    def test_create_task_plan(self, seed_instruction):
         """Test step 2: TASK_PLANNING - Breaking down an instruction into subtasks."""
-        # Set up test environment
-        os.chdir(tmpdir)
-        os.makedirs(os.path.join(tmpdir, ".aerith", "instructions"), exist_ok=True)
-        
-        # First create an instruction
-        instruction_result = create_instruction(
-            title="Add user profile page",
-            description="Create a user profile page with editable fields",
-            goal="Allow users to view and edit their profile information",
-            priority="high"
-        )
+        instruction_id = seed_instruction()
         
-        instruction_id = instruction_result["instruction_id"]
-        
-        # Create a task plan
-        subtasks = [
-            {
-                "id": "st-1",
-                "title": "Create profile component",
-                "description": "Build the main profile component structure",
-                "complexity": 3
-            },
-            {
-                "id": "st-2",
-                "title": "Implement edit form",
-                "description": "Create form for editing user information",
-                "complexity": 2,
-                "dependencies": ["st-1"]
-            },
-            {
-                "id": "st-3",
-                "title": "Add API integration",
-                "description": "Connect to backend API for saving profile data",
-                "complexity": 4,
-                "dependencies": ["st-2"]
-            }
-        ]
-        
-        result = create_task_plan(instruction_id, subtasks)
+        result = create_task_plan(instruction_id, copy.deepcopy(SUBTASKS))
         
         # Verify the response
         assert result["success"] is True
@@ -110,75 +137,26 @@ class TestCoreWorkflow:
         get_result = get_instruction(instruction_id)
         assert get_result["instruction"]["status"] == "planned"
     
-    def test_gather_information(self, tmpdir):
+    def test_gather_information(self, seed_instruction, aerith_tmp, button_component_repo):
         """Test step 3: INFORMATION_GATHERING - Collecting information from various sources."""
-        # Set up test environment
-        os.chdir(tmpdir)
-        os.makedirs(os.path.join(tmpdir, ".aerith", "instructions"), exist_ok=True)
-        os.makedirs(os.path.join(tmpdir, "src", "components"), exist_ok=True)
-        
-        # Create a simple component for testing
-        with open(os.path.join(tmpdir, "src", "components", "Button.tsx"), "w") as f:
-            f.write("""
-import React from 'react';
-
-interface ButtonProps {
-    text: string;
-    onClick?: () => void;
-}
-
-const Button: React.FC<ButtonProps> = ({ text, onClick }) => {
-    return (
-        <button onClick={onClick} className="btn">
-            {text}
-        </button>
-    );
-};
-
-export default Button;
-            """)
-        
-        # First create an instruction and task plan
-        instruction_result = create_instruction(
-            title="Update button component",
-            description="Update the Button component to support different sizes",
-            goal="Enhance Button component with size variants",
-            priority="medium"
-        )
-        
-        instruction_id = instruction_result["instruction_id"]
-        
-        # Create a basic task plan
-        subtasks = [
-            {
-                "title": "Analyze current Button implementation",
-                "description": "Review existing Button component code",
-                "complexity": 1
-            },
-            {
-                "title": "Add size property",
-                "description": "Implement size property and CSS classes",
-                "complexity": 2
-            }
-        ]
-        
-        create_task_plan(instruction_id, subtasks)
+        button_path = aerith_tmp / "src" / "components" / "Button.tsx"
+        link_fixture(button_component_repo, button_path)
+        instruction_id = seed_instruction(status="planned", workflow_step="TASK_PLANNING")
         
         # Define information sources
         sources = [
             {
                 "type": "file",
-                "path": os.path.join(tmpdir, "src", "components", "Button.tsx"),
+                "path": str(button_path),
                 "description": "Current Button component implementation"
             },
             {
                 "type": "directory",
-                "path": os.path.join(tmpdir, "src", "components"),
+                "path": str(button_path.parent),
                 "description": "List of existing components"
             }
         ]
         
-        # Gather information
         result = gather_information(instruction_id, sources)
         
         # Verify the response
@@ -192,63 +170,16 @@ export default Button;
         assert button_file_info["success"] is True
         assert "interface ButtonProps" in button_file_info["content"]
     
-    def test_analyze_and_orchestrate(self, tmpdir):
+    def test_analyze_and_orchestrate(self, seed_instruction):
         """Test step 4: ANALYSIS_AND_ORCHESTRATION - Analyzing information and creating an execution plan."""
-        # Set up test environment
-        os.chdir(tmpdir)
-        os.makedirs(os.path.join(tmpdir, ".aerith", "instructions"), exist_ok=True)
-        os.makedirs(os.path.join(tmpdir, "src", "components"), exist_ok=True)
-        
-        # Set up an instruction with gathered information
-        instruction_result = create_instruction(
-            title="Add tooltip component",
-            description="Create a reusable tooltip component",
-            goal="Implement a tooltip that can be attached to any element",
-            priority="medium"
+        gathered_information = {"sources": [], "summary": {"total_sources": 0}, "gathered_at": 0}
+        instruction_id = seed_instruction(
+            status="information_gathered",
+            workflow_step="INFORMATION_GATHERING",
+            gathered_information=gathered_information
         )
         
-        instruction_id = instruction_result["instruction_id"]
-        
-        # Create a task plan
-        subtasks = [{"title": "Design tooltip API", "complexity": 2}]
-        create_task_plan(instruction_id, subtasks)
-        
-        # Gather some information
-        sources = [{"type": "directory", "path": os.path.join(tmpdir, "src", "components")}]
-        gather_information(instruction_id, sources)
-        
-        # Define analysis and execution plan
-        analysis = {
-            "findings": [
-                "No existing tooltip implementation found",
-                "Button component provides a good pattern to follow"
-            ],
-            "recommendations": [
-                "Create a new Tooltip.tsx component",
-                "Use React portals for proper positioning"
-            ],
-            "decision_points": [
-                {"question": "Should tooltip support HTML content?", "decision": "Yes"}
-            ]
-        }
-        
-        execution_plan = [
-            {
-                "id": "step-1",
-                "title": "Create Tooltip component file",
-                "type": "file_creation",
-                "description": "Create the initial Tooltip component file"
-            },
-            {
-                "id": "step-2",
-                "title": "Create tooltip positioning logic",
-                "type": "file_modification",
-                "description": "Add positioning logic to the tooltip component"
-            }
-        ]
-        
-        # Analyze and orchestrate
-        result = analyze_and_orchestrate(instruction_id, analysis, execution_plan)
+        result = analyze_and_orchestrate(instruction_id, ANALYSIS, copy.deepcopy(EXECUTION_PLAN))
         
         # Verify the response
         assert result["success"] is True
@@ -256,57 +187,21 @@ export default Button;
         assert "execution_plan" in result["instruction"]
         assert len(result["instruction"]["execution_plan"]["steps"]) == 2
         assert result["instruction"]["workflow_step"] == "ANALYSIS_AND_ORCHESTRATION"
+        
+        # The analysis keeps the information gathered in the previous step
+        assert result["instruction"]["gathered_information"] == gathered_information
     
-    def test_execute_step(self, tmpdir):
+    def test_execute_step(self, seed_instruction, aerith_tmp):
         """Test step 5: RESULT_SYNTHESIS - Executing steps and generating reports."""
-        # Set up test environment
-        os.chdir(tmpdir)
-        os.makedirs(os.path.join(tmpdir, ".aerith", "instructions"), exist_ok=True)
-        
-        # Set up an instruction with an execution plan
-        instruction_result = create_instruction(
-            title="Add README section",
-            description="Add a new section to the README file",
-            goal="Document the new tooltip component",
-            priority="low"
+        readme_path = aerith_tmp / "README.md"
+        readme_path.write_text("# Test Project\n\n## Components\n\n")
+        instruction_id = seed_instruction(
+            status="analyzed",
+            workflow_step="ANALYSIS_AND_ORCHESTRATION",
+            execution_plan={"steps": [dict(EXECUTION_PLAN[0], status="pending")], "total_steps": 1, "current_step": 0}
         )
         
-        instruction_id = instruction_result["instruction_id"]
-        
-        # Create a basic task plan
-        subtasks = [{"title": "Write documentation", "complexity": 1}]
-        create_task_plan(instruction_id, subtasks)
-        
-        # Skip information gathering for simplicity
-        sources = []
-        gather_information(instruction_id, sources)
-        
-        # Create an analysis and execution plan
-        analysis = {"findings": ["README needs a new component section"]}
-        
-        # Create a temporary README for the test
-        readme_path = os.path.join(tmpdir, "README.md")
-        with open(readme_path, "w") as f:
-            f.write("# Test Project\n\n## Components\n\n")
-        
-        execution_plan = [
-            {
-                "id": "step-1",
-                "title": "Update README.md",
-                "type": "file_modification",
-                "description": "Add tooltip documentation to README"
-            }
-        ]
-        
-        analyze_and_orchestrate(instruction_id, analysis, execution_plan)
-        
-        # Execute the step with absolute path
-        execution_details = {
-            "file_path": readme_path,
-            "content": "# Test Project\n\n## Components\n\n### Tooltip\n\nThe Tooltip component provides contextual information on hover."
-        }
-        
-        result = execute_step(instruction_id, "step-1", execution_details)
+        result = execute_step(instruction_id, "step-1", {"file_path": str(readme_path), "content": README_CONTENT})
         
         # Verify the response
         assert result["success"] is True
@@ -315,71 +210,78 @@ export default Button;
         assert result["result"]["artifacts"][0]["action"] == "modified"
         
         # Verify file was actually modified
-        with open(readme_path, "r") as f:
-            content = f.read()
-            assert "### Tooltip" in content
+        assert b"### Button" in readme_path.read_bytes()
     
-    def test_generate_final_report(self, tmpdir):
+    def test_generate_final_report(self, seed_instruction):
         """Test the final report generation for a completed instruction."""
-        # Set up test environment
-        os.chdir(tmpdir)
-        os.makedirs(os.path.join(tmpdir, ".aerith", "instructions"), exist_ok=True)
-        
-        # Set up a completed instruction
-        instruction_result = create_instruction(
-            title="Add simple test feature",
-            description="Add a test feature for report generation",
-            goal="Test report generation",
-            priority="low"
-        )
-        
-        instruction_id = instruction_result["instruction_id"]
-        
-        # Create a basic task plan
-        subtasks = [{"title": "Test task", "complexity": 1}]
-        create_task_plan(instruction_id, subtasks)
-        
-        # Skip information gathering for simplicity
-        sources = []
-        gather_information(instruction_id, sources)
-        
-        # Create an analysis and execution plan
-        analysis = {"findings": ["Test finding"]}
-        execution_plan = [
-            {
-                "id": "step-1",
-                "title": "Test step",
-                "type": "file_creation",
-                "description": "Create a test file"
+        artifact = {"type": "file", "path": "README.md", "action": "modified"}
+        instruction_id = seed_instruction(
+            status="completed",
+            workflow_step="RESULT_SYNTHESIS",
+            execution_plan={
+                "steps": [dict(EXECUTION_PLAN[0], status="completed", result={"success": True, "artifacts": [artifact]})],
+                "total_steps": 1,
+                "current_step": 1
             }
-        ]
-        
-        analyze_and_orchestrate(instruction_id, analysis, execution_plan)
-        
-        # Execute the step
-        execution_details = {
-            "file_path": os.path.join(tmpdir, "test-file.txt"),
-            "content": "This is a test file"
-        }
-        
-        execute_step(instruction_id, "step-1", execution_details)
+        )
         
-        # Generate final report
         result = generate_final_report(instruction_id, include_details=True)
         
         # Verify the response
         assert result["success"] is True
         assert "final_report" in result["instruction"]
         assert result["instruction"]["status"] == "completed"
-        assert "artifacts" in result["report"]["summary"]
+        assert result["report"]["summary"]["artifacts"] == [artifact]
         assert "details" in result["report"]
     
-    def test_build_feature_high_level(self, tmpdir):
+    def test_full_workflow_e2e(self, aerith_tmp, button_component_repo):
+        """Test running every workflow step in order on one instruction."""
+        button_path = aerith_tmp / "src" / "components" / "Button.tsx"
+        link_fixture(button_component_repo, button_path)
+        readme_path = aerith_tmp / "README.md"
+        readme_path.write_text("# Test Project\n\n## Components\n\n")
+        
+        # Step 1: USER_INSTRUCTION
+        created = create_instruction(
+            title="Update button component",
+            description="Update the Button component to support different sizes",
+            goal="Enhance Button component with size variants",
+            priority="medium"
+        )
+        instruction_id = created["instruction_id"]
+        assert created["instruction"]["workflow_step"] == "USER_INSTRUCTION"
+        
+        # Step 2: TASK_PLANNING
+        planned = create_task_plan(instruction_id, copy.deepcopy(SUBTASKS))
+        assert planned["instruction"]["status"] == "planned"
+        assert planned["instruction"]["task_plan"]["total_subtasks"] == 3
+        
+        # Step 3: INFORMATION_GATHERING
+        gathered = gather_information(instruction_id, [{"type": "file", "path": str(button_path)}])
+        assert gathered["instruction"]["status"] == "information_gathered"
+        assert "interface ButtonProps" in gathered["instruction"]["gathered_information"]["sources"][0]["content"]
+        
+        # Step 4: ANALYSIS_AND_ORCHESTRATION
+        analyzed = analyze_and_orchestrate(instruction_id, ANALYSIS, copy.deepcopy(EXECUTION_PLAN))
+        assert analyzed["instruction"]["status"] == "analyzed"
+        assert analyzed["instruction"]["task_plan"] == planned["instruction"]["task_plan"]
+        
+        # Step 5: RESULT_SYNTHESIS
+        executed = execute_step(instruction_id, "step-1", {"file_path": str(readme_path), "content": README_CONTENT})
+        assert executed["success"] is True
+        assert executed["instruction"]["workflow_step"] == "RESULT_SYNTHESIS"
+        assert executed["instruction"]["execution_plan"]["current_step"] == 1
+        assert b"### Button" in readme_path.read_bytes()
+        
+        # Final report
+        reported = generate_final_report(instruction_id, include_details=True)
+        assert reported["success"] is True
+        assert reported["instruction"]["status"] == "completed"
+        assert reported["report"]["summary"]["successful_steps"] == 1
+        assert reported["report"]["summary"]["artifacts"] == executed["result"]["artifacts"]
+    
+    def test_build_feature_high_level(self):
         """Test the high-level build_feature function."""
-        # Set up test environment
-        os.chdir(tmpdir)
-        os.makedirs(os.path.join(tmpdir, ".aerith", "instructions"), exist_ok=True)
-        
         # Use the build_feature high-level function
         result = build_feature(
             title="Test feature", 
@@ -392,4 +294,8 @@ export default Button;
         assert result["success"] is True
         assert "instruction_id" in result
         assert "next_steps" in result
-        assert len(result["next_steps"]) == 5  # Should suggest all 5 workflow steps 
\ No newline at end of file
+        assert len(result["next_steps"]) == 5  # Should suggest all 5 workflow steps
+        
+        # Only the instruction is created; the remaining steps are left to the caller
+        assert result["instruction"]["workflow_step"] == "USER_INSTRUCTION"
+        assert [i["id"] for i in get_instructions()] == [result["instruction_id"]] 
\ No newline at end of file
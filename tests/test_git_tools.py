@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Tests for the Git tools in the MCP server.
+"""
+import os
+import asyncio
+import shutil
+import subprocess
+import pytest
+
+# Import the functions we need for testing
+from server import git_status, git_log, git_diff, git_branch, git_commit, git_checkout, _git_command, _detect_git_version, _make_status_parser
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+
+@pytest.fixture
+def git_repo(tmp_path, monkeypatch):
+    """Create a git repository with one commit and switch into it."""
+    monkeypatch.chdir(tmp_path)
+
+    def git(*args):
+        subprocess.run(["git", *args], check=True, capture_output=True)
+
+    git("init", "-q")
+    git("config", "user.email", "test@example.com")
+    git("config", "user.name", "Test User")
+    git("checkout", "-q", "-b", "main")
+
+    with open("tracked.txt", "w") as f:
+        f.write("original\n")
+    git("add", "tracked.txt")
+    git("commit", "-q", "-m", "Initial commit")
+
+    return git
+
+
+class TestGitCommand:
+    """Test class for the shared git command builder."""
+
+    @pytest.mark.parametrize("subcommand,flags,args,expected", [
+        ("push", (("--force", True), ("--tags", False)), ("origin", "main"),
+         ["git", "push", "--force", "origin", "main"]),
+        ("pull", (("--rebase", False),), ("origin", ""), ["git", "pull", "origin"]),
+        ("checkout", (("-f", True), ("-b", True)), ("topic",), ["git", "checkout", "-f", "-b", "topic"]),
+        ("commit", (), (), ["git", "commit"]),
+    ])
+    def test_git_command(self, subcommand, flags, args, expected):
+        """Test that enabled flags and non-empty arguments are kept in order."""
+        assert _git_command(subcommand, flags, args) == expected
+
+
+class TestGitStatus:
+    """Test class for the git_status tool."""
+
+    def test_clean_working_tree(self, git_repo):
+        """Test status of a repository without changes."""
+        result = asyncio.run(git_status())
+
+        assert result["success"] is True
+        assert result["status"]["branch"] == "main"
+        assert result["status"]["is_clean"] is True
+        assert result["status"]["changes"] == {"staged": [], "not_staged": [], "untracked": []}
+
+    def test_changes_are_grouped_by_section(self, git_repo):
+        """Test that staged, unstaged and untracked files land in the right section."""
+        with open("staged.txt", "w") as f:
+            f.write("new\n")
+        git_repo("add", "staged.txt")
+        with open("tracked.txt", "a") as f:
+            f.write("changed\n")
+        os.makedirs("untracked_dir")
+        with open(os.path.join("untracked_dir", "untracked.txt"), "w") as f:
+            f.write("untracked\n")
+
+        result = asyncio.run(git_status(detailed=True))
+        changes = result["status"]["changes"]
+
+        assert result["success"] is True
+        assert result["status"]["is_clean"] is False
+        assert changes["staged"] == [{"status": "new file", "file": "staged.txt"}]
+        assert changes["not_staged"] == [{"status": "modified", "file": "tracked.txt"}]
+        assert changes["untracked"] == [{"status": "untracked", "file": "untracked_dir/untracked.txt"}]
+
+    def test_parse_status_output_bytes(self):
+        """Test parsing raw status bytes, including CRLF endings and undecodable names."""
+        output = (
+            b"On branch feature/x\r\n"
+            b"Changes not staged for commit:\r\n"
+            b'  (use "git add <file>..." to update what will be committed)\r\n'
+            b"\tdeleted:    gone.txt\r\n"
+            b"\r\n"
+            b"Untracked files:\r\n"
+            b"\tcaf\xe9.txt\r\n"
+        )
+
+        parsed = _make_status_parser((2, 39, 0))(output)
+
+        assert parsed["branch"] == "feature/x"
+        assert parsed["changes"]["staged"] == []
+        assert parsed["changes"]["not_staged"] == [{"status": "deleted", "file": "gone.txt"}]
+        assert parsed["changes"]["untracked"] == [{"status": "untracked", "file": "caf\ufffd.txt"}]
+
+    def test_parse_legacy_comment_prefixed_output(self):
+        """Test that the parser for git < 1.8.5 strips the "#" line prefix."""
+        output = (
+            b"# On branch main\n"
+            b"# Changes to be committed:\n"
+            b'#   (use "git reset HEAD <file>..." to unstage)\n'
+            b"#\n"
+            b"#\tnew file:   added.txt\n"
+            b"#\n"
+            b"# Untracked files:\n"
+            b"#\tloose.txt\n"
+        )
+
+        parsed = _make_status_parser((1, 8, 4))(output)
+
+        assert parsed["branch"] == "main"
+        assert parsed["changes"]["staged"] == [{"status": "new file", "file": "added.txt"}]
+        assert parsed["changes"]["untracked"] == [{"status": "untracked", "file": "loose.txt"}]
+
+    def test_status_parser_is_cached_per_version(self):
+        """Test that parsers are built once per git version."""
+        assert _make_status_parser((2, 39, 0)) is _make_status_parser((2, 39, 0))
+        assert _make_status_parser((2, 39, 0)) is not _make_status_parser((1, 8, 4))
+        assert _detect_git_version() >= (1,)
+
+    def test_not_a_repository(self, tmp_path, monkeypatch):
+        """Test that running outside a repository reports an error."""
+        monkeypatch.chdir(tmp_path)
+
+        result = asyncio.run(git_status())
+
+        assert result["success"] is False
+        assert result["message"].startswith("Error:")
+
+
+class TestAsyncReadTools:
+    """Test class for overlapping the read-only git tools."""
+
+    def test_gather_read_only_tools(self, git_repo):
+        """Test that status, log and diff can run concurrently on one event loop."""
+        with open("tracked.txt", "a") as f:
+            f.write("changed\n")
+
+        async def read_all():
+            return await asyncio.gather(git_status(), git_log(count=1), git_diff())
+
+        status, log, diff = asyncio.run(read_all())
+
+        assert status["status"]["changes"]["not_staged"] == [{"status": "modified", "file": "tracked.txt"}]
+        assert [c["message"] for c in log["commits"]] == ["Initial commit"]
+        assert diff["files_changed"][0]["changes"] == {"insertions": 1, "deletions": 0}
+
+
+class TestGitDiff:
+    """Test class for the git_diff tool."""
+
+    def test_small_diff_is_not_truncated(self, git_repo):
+        """Test that a diff under the cap keeps full context and a computed summary."""
+        with open("tracked.txt", "a") as f:
+            f.write("changed\n")
+
+        result = asyncio.run(git_diff())
+
+        assert result["success"] is True
+        assert result["summary"] == {
+            "files": 1,
+            "insertions": 1,
+            "deletions": 0,
+            "truncated": False,
+            "context_reduced": False,
+            "context_lines": 3
+        }
+
+    def test_reduced_context_diff_is_flagged(self, git_repo):
+        """Test that a diff which only fits with -U1 is flagged as reduced, not truncated."""
+        with open("tracked.txt", "w") as f:
+            f.write("".join(f"line {n}\n" for n in range(100)))
+        git_repo("commit", "-q", "-am", "Add lines")
+        with open("tracked.txt", "w") as f:
+            f.write("".join(f"line {n}{' changed' if n % 10 == 5 else ''}\n" for n in range(100)))
+
+        reduced = subprocess.run(["git", "diff", "-U1"], capture_output=True).stdout
+        result = asyncio.run(git_diff(max_bytes=len(reduced)))
+
+        assert result["success"] is True
+        assert result["raw_output"].encode() == reduced
+        assert result["summary"]["truncated"] is False
+        assert result["summary"]["context_reduced"] is True
+        assert result["summary"]["context_lines"] == 1
+
+    def test_large_diff_is_capped(self, git_repo):
+        """Test that a diff over the cap is re-run with less context and cut at max_bytes."""
+        for i in range(20):
+            with open(f"file_{i:02d}.txt", "w") as f:
+                f.write("".join(f"line {n}\n" for n in range(50)))
+        git_repo("add", ".")
+
+        result = asyncio.run(git_diff(staged=True, max_bytes=2048))
+
+        assert result["success"] is True
+        assert len(result["raw_output"].encode()) <= 2048
+        assert result["raw_output"].endswith("\n")
+        assert result["summary"]["truncated"] is True
+        assert result["summary"]["context_reduced"] is True
+        assert result["summary"]["context_lines"] == 1
+        # Totals come from --shortstat, not from the truncated output
+        assert result["summary"]["files"] == 20
+        assert result["summary"]["insertions"] == 1000
+        assert len(result["files_changed"]) < 20
+
+
+class TestGitBranch:
+    """Test class for the git_branch tool."""
+
+    def test_list_local_branches(self, git_repo):
+        """Test listing local branches and detecting the current one."""
+        git_repo("branch", "feature/login")
+
+        result = git_branch()
+
+        assert result["success"] is True
+        assert result["current_branch"] == "main"
+        assert result["branches"] == [
+            {"name": "feature/login", "is_current": False, "type": "local"},
+            {"name": "main", "is_current": True, "type": "local"}
+        ]
+        # The message keeps the `git branch` layout
+        assert result["message"] == "  feature/login\n* main\n"
+
+    def test_create_and_delete_branch(self, git_repo):
+        """Test creating a branch, then deleting it."""
+        created = git_branch(create=True, branch_name="feature/login")
+        assert created["success"] is True
+        assert "feature/login" in [b["name"] for b in git_branch()["branches"]]
+
+        deleted = git_branch(delete=True, branch_name="feature/login")
+        assert deleted["success"] is True
+        assert [b["name"] for b in git_branch()["branches"]] == ["main"]
+
+    def test_list_remote_branches(self, git_repo):
+        """Test that remote-tracking branches are only listed when requested."""
+        git_repo("update-ref", "refs/remotes/origin/main", "HEAD")
+
+        local_only = git_branch()
+        with_remote = git_branch(remote=True)
+
+        assert [b["name"] for b in local_only["branches"]] == ["main"]
+        assert {"name": "origin/main", "is_current": False, "type": "remote"} in with_remote["branches"]
+
+
+class TestGitCommit:
+    """Test class for the git_commit tool."""
+
+    def test_commit_returns_full_hash(self, git_repo):
+        """Test that the commit id is the full hash of the new HEAD."""
+        with open("tracked.txt", "a") as f:
+            f.write("changed\n")
+
+        result = git_commit("Update tracked file", all_changes=True)
+
+        head = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+        assert result["success"] is True
+        assert result["commit_id"] == head
+
+    def test_amend_without_message_keeps_message(self, git_repo):
+        """Test that amending without a message reuses the previous one."""
+        result = git_commit("", amend=True)
+
+        log = subprocess.run(["git", "log", "-1", "--format=%s"], capture_output=True, text=True).stdout.strip()
+        assert result["success"] is True
+        assert log == "Initial commit"
+
+    def test_malformed_hash_is_rejected(self, git_repo, monkeypatch):
+        """Test that unexpected rev-parse output does not leak into commit_id."""
+        import server
+        real_run_command = server.run_command
+
+        def fake_run_command(cmd, **kwargs):
+            if cmd[:2] == ["git", "rev-parse"]:
+                return {"success": True, "output": "abcd123]\n", "error": "", "returncode": 0}
+            return real_run_command(cmd, **kwargs)
+
+        monkeypatch.setattr(server, "run_command", fake_run_command)
+        with open("tracked.txt", "a") as f:
+            f.write("changed\n")
+
+        result = git_commit("Update tracked file", all_changes=True)
+
+        assert result["success"] is True
+        assert result["commit_id"] is None
+
+    def test_commit_without_changes_fails(self, git_repo):
+        """Test that a failed commit reports no commit id."""
+        result = git_commit("Nothing to commit")
+
+        assert result["success"] is False
+        assert result["commit_id"] is None
+
+
+class TestGitCheckout:
+    """Test class for the git_checkout tool."""
+
+    def test_force_create_branch(self, git_repo):
+        """Test creating a branch with force enabled."""
+        result = git_checkout("topic", create=True, force=True)
+
+        assert result["success"] is True
+        assert result["branch"] == "topic"
+        assert asyncio.run(git_status())["status"]["branch"] == "topic"
@@ -1,38 +1,22 @@
 #!/usr/bin/env python3
 """
 Integration test for the Aerith Admin MCP server implementing the Manus-inspired workflow.
-This test validates the complete development flow from instruction creation to final report.
+These tests validate the complete development flow from instruction creation to final report;
+each workflow stage is a fixture that builds on the previous one.
 """
 import os
 import json
 import shutil
 import pytest
-import tempfile
 from pathlib import Path
 
 # Import the MCP server components
-from server import FastMCP, create_instruction, get_instruction, create_task_plan, \
+from server import FastMCP, create_instruction, create_task_plan, \
     gather_information, analyze_and_orchestrate, execute_step, generate_final_report
 
 
-@pytest.fixture
-def test_environment():
-    """Set up a temporary test environment."""
-    # Create temp directory for the test
-    test_dir = tempfile.mkdtemp()
-    original_cwd = os.getcwd()
-    os.chdir(test_dir)
-    
-    # Create .aerith directory structure
-    os.makedirs(os.path.join(test_dir, ".aerith", "instructions"), exist_ok=True)
-    os.makedirs(os.path.join(test_dir, ".aerith", "logs"), exist_ok=True)
-    
-    # Create a basic file structure for testing
-    os.makedirs(os.path.join(test_dir, "src", "components"), exist_ok=True)
-    
-    # Create a simple component for testing
-    with open(os.path.join(test_dir, "src", "components", "Button.tsx"), "w") as f:
-        f.write("""
+# Sample component source, encoded once at import time
+BUTTON_TSX = b"""
 import React from 'react';
 
 interface ButtonProps {
@@ -49,44 +33,117 @@ const Button: React.FC<ButtonProps> = ({ text, onClick }) => {
 };
 
 export default Button;
-        """)
+        """
+
+
+@pytest.fixture(scope="session")
+def _sample_tree(tmp_path_factory):
+    """Write the read-only sample project once per session."""
+    seed = tmp_path_factory.mktemp("seed")
+    
+    # Create a basic file structure for testing
+    (seed / "src" / "components").mkdir(parents=True)
     
-    # Return working directory and test directory for use in tests
-    yield {"test_dir": test_dir}
+    # Create a simple component for testing
+    (seed / "src" / "components" / "Button.tsx").write_bytes(BUTTON_TSX)
     
-    # Cleanup after test
-    os.chdir(original_cwd)
-    shutil.rmtree(test_dir)
+    return seed
+
+
+def unshare(path):
+    """Replace a hard-linked seed file with a private copy before editing it in place."""
+    data = path.read_bytes()
+    path.unlink()
+    path.write_bytes(data)
 
 
-def test_complete_workflow(test_environment):
-    """Test the complete MCP workflow from instruction to final report."""
-    test_dir = test_environment["test_dir"]
+@pytest.fixture
+def test_environment(tmp_path, monkeypatch, _sample_tree):
+    """Set up a temporary test environment."""
+    # Hard-link the sample project instead of rewriting it for every test
+    work_dir = tmp_path / "work"
+    shutil.copytree(_sample_tree, work_dir, copy_function=os.link, dirs_exist_ok=True)
+    monkeypatch.chdir(work_dir)
+    
+    # Create .aerith directory structure
+    (work_dir / ".aerith" / "instructions").mkdir(parents=True)
+    (work_dir / ".aerith" / "logs").mkdir(parents=True)
     
-    # STEP 1: USER_INSTRUCTION - Create a new instruction
-    create_result = create_instruction(
+    # Return the test directory for use in tests; pytest removes it later
+    return {"test_dir": str(work_dir)}
+
+
+@pytest.fixture
+def make_instruction(test_environment):
+    """
+    Factory that runs the workflow up to ANALYSIS_AND_ORCHESTRATION and returns the instruction id.
+    
+    The execution plan passed in becomes the instruction's plan, so a test
+    only has to execute the steps it cares about.
+    """
+    def factory(execution_plan):
+        instruction_id = create_instruction(
+            title="Test Error Handling",
+            description="Test how the workflow handles errors",
+            goal="Verify error resilience",
+            priority="low"
+        )["instruction_id"]
+        create_task_plan(
+            instruction_id=instruction_id,
+            subtasks=[
+                {
+                    "title": "Test error handling",
+                    "description": "Execute a command that will fail",
+                    "complexity": 1
+                }
+            ]
+        )
+        gather_information(
+            instruction_id=instruction_id,
+            sources=[{"type": "directory", "path": "."}]
+        )
+        analyze_and_orchestrate(
+            instruction_id=instruction_id,
+            analysis={"findings": ["Test error handling"]},
+            execution_plan=execution_plan
+        )
+        return instruction_id
+    
+    return factory
+
+
+@pytest.fixture(scope="module", params=["low", "medium", "high"])
+def workspace(request, tmp_path_factory, _sample_tree):
+    """Module-wide copy of the sample project, one per instruction priority."""
+    work_dir = tmp_path_factory.mktemp(f"workflow-{request.param}")
+    shutil.copytree(_sample_tree, work_dir, copy_function=os.link, dirs_exist_ok=True)
+    (work_dir / ".aerith" / "instructions").mkdir(parents=True)
+    # Button.tsx is patched in place by the workflow
+    unshare(work_dir / "src" / "components" / "Button.tsx")
+    
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(work_dir)
+        yield {"test_dir": work_dir, "priority": request.param}
+
+
+# Each stage runs one workflow step on top of the previous one, once per
+# workspace, and returns that step's result
+@pytest.fixture(scope="module")
+def instruction_created(workspace):
+    """STEP 1: USER_INSTRUCTION - Create a new instruction."""
+    return create_instruction(
         title="Add Hover Effect to Button Component",
         description="Enhance the Button component to have a hover effect that changes color",
         goal="Improve user experience with visual feedback",
-        priority="medium"
+        priority=workspace["priority"]
     )
-    
-    assert create_result["success"] is True
-    instruction_id = create_result["instruction_id"]
-    
-    # Verify instruction was created and saved
-    instruction_path = os.path.join(test_dir, ".aerith", "instructions", f"{instruction_id}.json")
-    assert os.path.exists(instruction_path)
-    
-    # Verify get_instruction works
-    get_result = get_instruction(instruction_id)
-    assert get_result["success"] is True
-    assert get_result["instruction"]["title"] == "Add Hover Effect to Button Component"
-    assert get_result["instruction"]["workflow_step"] == "USER_INSTRUCTION"
-    
-    # STEP 2: TASK_PLANNING - Break down into subtasks
-    plan_result = create_task_plan(
-        instruction_id=instruction_id,
+
+
+@pytest.fixture(scope="module")
+def plan_created(instruction_created):
+    """STEP 2: TASK_PLANNING - Break down into subtasks."""
+    return create_task_plan(
+        instruction_id=instruction_created["instruction_id"],
         subtasks=[
             {
                 "id": "st-1",
@@ -110,14 +167,13 @@ def test_complete_workflow(test_environment):
             }
         ]
     )
-    
-    assert plan_result["success"] is True
-    assert len(plan_result["instruction"]["task_plan"]["subtasks"]) == 3
-    assert plan_result["instruction"]["workflow_step"] == "TASK_PLANNING"
-    
-    # STEP 3: INFORMATION_GATHERING - Gather relevant information
-    gather_result = gather_information(
-        instruction_id=instruction_id,
+
+
+@pytest.fixture(scope="module")
+def info_gathered(plan_created):
+    """STEP 3: INFORMATION_GATHERING - Gather relevant information."""
+    return gather_information(
+        instruction_id=plan_created["instruction"]["id"],
         sources=[
             {
                 "type": "file",
@@ -129,13 +185,13 @@ def test_complete_workflow(test_environment):
             }
         ]
     )
-    
-    assert gather_result["success"] is True
-    assert gather_result["instruction"]["workflow_step"] == "INFORMATION_GATHERING"
-    
-    # STEP 4: ANALYSIS_AND_ORCHESTRATION - Analyze information and create execution plan
-    analysis_result = analyze_and_orchestrate(
-        instruction_id=instruction_id,
+
+
+@pytest.fixture(scope="module")
+def analyzed(info_gathered):
+    """STEP 4: ANALYSIS_AND_ORCHESTRATION - Analyze information and create execution plan."""
+    return analyze_and_orchestrate(
+        instruction_id=info_gathered["instruction"]["id"],
         analysis={
             "findings": [
                 "Button component uses a 'btn' class for styling",
@@ -164,12 +220,12 @@ def test_complete_workflow(test_environment):
             }
         ]
     )
-    
-    assert analysis_result["success"] is True
-    assert len(analysis_result["instruction"]["execution_plan"]["steps"]) == 2
-    assert analysis_result["instruction"]["workflow_step"] == "ANALYSIS_AND_ORCHESTRATION"
-    
-    # STEP 5: RESULT_SYNTHESIS - Execute steps and generate report
+
+
+@pytest.fixture(scope="module")
+def executed(analyzed):
+    """STEP 5: RESULT_SYNTHESIS - Execute both steps of the plan."""
+    instruction_id = analyzed["instruction"]["id"]
     
     # Execute step 1: Create CSS file
     step1_result = execute_step(
@@ -195,9 +251,6 @@ def test_complete_workflow(test_environment):
         }
     )
     
-    assert step1_result["success"] is True
-    assert os.path.exists(os.path.join(test_dir, "src", "components", "Button.css"))
-    
     # Execute step 2: Modify Button component
     step2_result = execute_step(
         instruction_id=instruction_id,
@@ -214,16 +267,62 @@ def test_complete_workflow(test_environment):
         }
     )
     
-    assert step2_result["success"] is True
+    return step1_result, step2_result
+
+
+def test_instruction_created(workspace, instruction_created):
+    """Test that the instruction is created and saved."""
+    assert instruction_created["success"] is True
+    instruction_id = instruction_created["instruction_id"]
     
-    # Verify file was modified correctly
-    with open(os.path.join(test_dir, "src", "components", "Button.tsx"), "r") as f:
-        content = f.read()
-        assert "import './Button.css';" in content
+    # Verify instruction was created and saved
+    instruction_path = workspace["test_dir"] / ".aerith" / "instructions" / f"{instruction_id}.json"
+    assert instruction_path.exists()
+    
+    # Verify the stored instruction matches
+    instruction = json.loads(instruction_path.read_bytes())
+    assert instruction["title"] == "Add Hover Effect to Button Component"
+    assert instruction["priority"] == workspace["priority"]
+    assert instruction_created["instruction"]["workflow_step"] == "USER_INSTRUCTION"
+
+
+def test_plan_created(plan_created):
+    """Test breaking the instruction down into subtasks."""
+    assert plan_created["success"] is True
+    assert len(plan_created["instruction"]["task_plan"]["subtasks"]) == 3
+    assert plan_created["instruction"]["workflow_step"] == "TASK_PLANNING"
+
+
+def test_info_gathered(info_gathered):
+    """Test gathering information from the component file and a search."""
+    assert info_gathered["success"] is True
+    assert info_gathered["instruction"]["workflow_step"] == "INFORMATION_GATHERING"
+
+
+def test_analyzed(analyzed):
+    """Test creating the execution plan."""
+    assert analyzed["success"] is True
+    assert len(analyzed["instruction"]["execution_plan"]["steps"]) == 2
+    assert analyzed["instruction"]["workflow_step"] == "ANALYSIS_AND_ORCHESTRATION"
+
+
+def test_steps_executed(workspace, executed):
+    """Test that both execution steps change the project files."""
+    step1_result, step2_result = executed
+    components = workspace["test_dir"] / "src" / "components"
+    
+    assert step1_result["success"] is True
+    assert (components / "Button.css").exists()
     
-    # Generate final report
+    # Verify file was modified correctly
+    assert step2_result["success"] is True
+    assert b"import './Button.css';" in (components / "Button.tsx").read_bytes()
+
+
+def test_final_report(executed):
+    """Test the final report for the executed instruction."""
     report_result = generate_final_report(
-        instruction_id=instruction_id,
+        instruction_id=executed[1]["instruction"]["id"],
         include_details=True
     )
     
@@ -240,49 +339,17 @@ def test_complete_workflow(test_environment):
     assert "src/components/Button.css" in artifact_paths
 
 
-def test_failed_execution(test_environment):
+def test_failed_execution(make_instruction):
     """Test handling of errors in the workflow."""
-    # Create instruction
-    create_result = create_instruction(
-        title="Test Error Handling",
-        description="Test how the workflow handles errors",
-        goal="Verify error resilience",
-        priority="low"
-    )
-    
-    instruction_id = create_result["instruction_id"]
-    
-    # Create task plan
-    create_task_plan(
-        instruction_id=instruction_id,
-        subtasks=[
-            {
-                "title": "Test error handling",
-                "description": "Execute a command that will fail",
-                "complexity": 1
-            }
-        ]
-    )
-    
-    # Create minimal information gathering
-    gather_information(
-        instruction_id=instruction_id,
-        sources=[{"type": "directory", "path": "."}]
-    )
-    
-    # Create execution plan with a step that will fail
-    analyze_and_orchestrate(
-        instruction_id=instruction_id,
-        analysis={"findings": ["Test error handling"]},
-        execution_plan=[
-            {
-                "id": "error-step",
-                "title": "Execute invalid command",
-                "type": "command_execution",
-                "description": "Run a command that doesn't exist"
-            }
-        ]
-    )
+    # Prepare an instruction whose only step will fail
+    instruction_id = make_instruction([
+        {
+            "id": "error-step",
+            "title": "Execute invalid command",
+            "type": "command_execution",
+            "description": "Run a command that doesn't exist"
+        }
+    ])
     
     # Execute step that will fail
     error_result = execute_step(
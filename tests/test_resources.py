@@ -6,29 +6,81 @@ import os
 import sys
 import json
 import pytest
+import orjson
 from pathlib import Path
 
-# Import the test fixture
-from conftest import add_mcp_to_path
-
 # Import the functions we need for testing
 from server import get_file, get_project_structure, get_instructions, create_instruction
 
 
+# Seed file contents, encoded once at import time
+RESOURCE_TXT = b"This is a test resource file"
+SAMPLE_FILES = {
+    os.path.join("src", "components", "Button.tsx"): b"// Button component",
+    os.path.join("src", "utils", "helpers.js"): b"// Helper functions",
+    os.path.join("public", "assets", "logo.svg"): b"<svg></svg>",
+}
+
+
+@pytest.fixture(scope="session")
+def sample_project(tmp_path_factory):
+    """Build the sample project tree once and return it with its expected structure.
+    
+    The tree is shared by every test in the session, so tests must treat it
+    as read-only.
+    """
+    root = tmp_path_factory.mktemp("sample_project")
+    expected = {}
+    for path, content in SAMPLE_FILES.items():
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_bytes(content)
+        
+        *dirs, name = Path(path).parts
+        node = expected
+        for directory in dirs:
+            node = node.setdefault(directory, {"type": "directory"})
+        node[name] = {"type": "file", "size": len(content)}
+    return root, expected
+
+
+@pytest.fixture(scope="session")
+def instruction_template():
+    """Template for instructions written directly to the instructions directory."""
+    return {
+        "id": "template",
+        "title": "Test Instruction",
+        "description": "Test description",
+        "goal": "Test goal",
+        "priority": "medium",
+        "status": "created",
+        "created_at": 1234567890,
+        "workflow_step": "USER_INSTRUCTION"
+    }
+
+
 class TestResourceFunctions:
-    """Test class for resource access functions in the server."""
+    """Test class for resource access functions in the server.
+    
+    The tests run against pyfakefs' in-memory filesystem (the `fs`
+    fixture), so no files are written to disk.
+    """
     
-    def test_get_file_resource(self, tmpdir):
+    @pytest.fixture(autouse=True)
+    def project(self, fs):
+        """Create an in-memory project directory and make it the current directory."""
+        fs.create_dir("/project")
+        # os is patched by pyfakefs, so this only changes the fake working directory
+        os.chdir("/project")
+        return Path("/project")
+    
+    def test_get_file_resource(self, project):
         """Test the get_file resource function."""
-        # Set up test environment
-        os.chdir(tmpdir)
         
         # Create a test file
         test_content = "This is a test resource file"
         test_file = "test_resource.txt"
         
-        with open(test_file, "w") as f:
-            f.write(test_content)
+        Path(test_file).write_bytes(RESOURCE_TXT)
         
         # Get the file using the resource function
         content = get_file(test_file)
@@ -41,56 +93,11 @@ class TestResourceFunctions:
         content = get_file(non_existent)
         assert f"File not found: {non_existent}" == content
     
-    def test_get_project_structure_resource(self, tmpdir):
-        """Test the get_project_structure resource function."""
-        # Set up test environment
-        os.chdir(tmpdir)
-        
-        # Create a simple project structure for testing
-        os.makedirs(os.path.join("src", "components"), exist_ok=True)
-        os.makedirs(os.path.join("src", "utils"), exist_ok=True)
-        os.makedirs(os.path.join("public", "assets"), exist_ok=True)
-        
-        # Create some test files
-        with open(os.path.join("src", "components", "Button.tsx"), "w") as f:
-            f.write("// Button component")
-        
-        with open(os.path.join("src", "utils", "helpers.js"), "w") as f:
-            f.write("// Helper functions")
-        
-        with open(os.path.join("public", "assets", "logo.svg"), "w") as f:
-            f.write("<svg></svg>")
-        
-        # Get the project structure
-        structure = get_project_structure()
-        
-        # Verify the structure contains the expected directories and files
-        assert "src" in structure
-        assert structure["src"]["type"] == "directory"
-        assert "components" in structure["src"]
-        assert "utils" in structure["src"]
-        
-        assert "public" in structure
-        assert structure["public"]["type"] == "directory"
-        assert "assets" in structure["public"]
-        
-        # Verify file detection
-        assert "Button.tsx" in structure["src"]["components"]
-        assert structure["src"]["components"]["Button.tsx"]["type"] == "file"
-        
-        assert "helpers.js" in structure["src"]["utils"]
-        assert structure["src"]["utils"]["helpers.js"]["type"] == "file"
-        
-        assert "logo.svg" in structure["public"]["assets"]
-        assert structure["public"]["assets"]["logo.svg"]["type"] == "file"
-    
-    def test_get_instructions_resource(self, tmpdir):
+    def test_get_instructions_resource(self, project, instruction_template):
         """Test the get_instructions resource function."""
-        # Set up test environment
-        os.chdir(tmpdir)
-        os.makedirs(os.path.join(tmpdir, ".aerith", "instructions"), exist_ok=True)
+        os.makedirs(os.path.join(project, ".aerith", "instructions"), exist_ok=True)
         
-        # Create a few test instructions
+        # Create one instruction through the tool to cover the production path
         instruction1 = create_instruction(
             title="Test Instruction 1",
             description="Test description 1",
@@ -98,48 +105,38 @@ class TestResourceFunctions:
             priority="high"
         )
         
-        instruction2 = create_instruction(
-            title="Test Instruction 2",
-            description="Test description 2",
-            goal="Test goal 2",
-            priority="medium"
-        )
-        
-        instruction3 = create_instruction(
-            title="Test Instruction 3",
-            description="Test description 3",
-            goal="Test goal 3",
-            priority="low"
-        )
+        # Write the others directly, one buffered write per file
+        instructions_dir = project / ".aerith" / "instructions"
+        written = []
+        for n, priority in ((2, "medium"), (3, "low")):
+            variant = dict(
+                instruction_template,
+                id=f"test-{n}",
+                title=f"Test Instruction {n}",
+                priority=priority
+            )
+            (instructions_dir / f"{variant['id']}.json").write_bytes(orjson.dumps(variant))
+            written.append({"instruction_id": variant["id"]})
+        instruction2, instruction3 = written
         
         # Get all instructions
         instructions = get_instructions()
         
         # Verify the instructions were retrieved
-        assert len(instructions) >= 3  # There might be more from previous tests
-        
-        # Check if our instructions are in the list
-        instruction_ids = [instr["id"] for instr in instructions]
-        assert instruction1["instruction_id"] in instruction_ids
-        assert instruction2["instruction_id"] in instruction_ids
-        assert instruction3["instruction_id"] in instruction_ids
+        assert len(instructions) == 3
         
         # Verify instruction content
-        for instr in instructions:
-            if instr["id"] == instruction1["instruction_id"]:
-                assert instr["title"] == "Test Instruction 1"
-                assert instr["priority"] == "high"
-            elif instr["id"] == instruction2["instruction_id"]:
-                assert instr["title"] == "Test Instruction 2"
-                assert instr["priority"] == "medium"
-            elif instr["id"] == instruction3["instruction_id"]:
-                assert instr["title"] == "Test Instruction 3"
-                assert instr["priority"] == "low"
+        by_id = {instr["id"]: instr for instr in instructions}
+        for created, title, priority in (
+            (instruction1, "Test Instruction 1", "high"),
+            (instruction2, "Test Instruction 2", "medium"),
+            (instruction3, "Test Instruction 3", "low"),
+        ):
+            assert by_id[created["instruction_id"]]["title"] == title
+            assert by_id[created["instruction_id"]]["priority"] == priority
     
-    def test_resource_error_handling(self, tmpdir):
+    def test_resource_error_handling(self, project):
         """Test error handling in resource functions."""
-        # Set up test environment
-        os.chdir(tmpdir)
         
         # Test with an invalid file path - must use mock to avoid TypeError
         with pytest.raises(TypeError):
@@ -148,21 +145,17 @@ class TestResourceFunctions:
             get_file(None)
             
         # Use an absolute path to a non-existent file
-        non_existent_file = os.path.join(tmpdir, "does_not_exist.txt")
+        non_existent_file = os.path.join(project, "does_not_exist.txt")
         content = get_file(non_existent_file)
         assert f"File not found: {non_existent_file}" in content
         
         # Test with a directory instead of a file
-        dir_path = os.path.join(tmpdir, "test_dir")
+        dir_path = os.path.join(project, "test_dir")
         os.makedirs(dir_path, exist_ok=True)
         content = get_file(dir_path)
-        assert "Error reading file" in content
+        assert content.startswith("Error reading file")
         
         # Test with a non-existent instructions directory
-        # First, make sure we're in the tmpdir 
-        # and don't accidentally remove real instruction files
-        assert os.getcwd() == str(tmpdir)
-        
         # Create a clean .aerith directory with no instructions
         import shutil
         if os.path.exists(os.path.join(".aerith", "instructions")):
@@ -170,4 +163,43 @@ class TestResourceFunctions:
         
         # Now test getting instructions from empty directory
         instructions = get_instructions()
-        assert instructions == [] 
\ No newline at end of file
+        assert instructions == []
+
+
+def _lookup(structure, path):
+    """Walk a get_project_structure() dict along a slash-separated path."""
+    for part in path.split("/"):
+        structure = structure[part]
+    return structure
+
+
+@pytest.mark.parametrize("path,kind", [
+    ("src", "directory"),
+    ("src/components", "directory"),
+    ("src/utils", "directory"),
+    ("public", "directory"),
+    ("public/assets", "directory"),
+    ("src/components/Button.tsx", "file"),
+    ("src/utils/helpers.js", "file"),
+    ("public/assets/logo.svg", "file"),
+])
+def test_get_project_structure_resource(sample_project, monkeypatch, path, kind):
+    """Test the get_project_structure resource function."""
+    root, _ = sample_project
+    monkeypatch.chdir(root)
+    
+    structure = get_project_structure()
+    
+    assert _lookup(structure, path)["type"] == kind
+
+
+@pytest.mark.slow
+def test_resources_on_real_filesystem(sample_project, monkeypatch):
+    """Sanity check the resource functions against the real filesystem."""
+    path, expected = sample_project
+    monkeypatch.chdir(path)
+    
+    # Directories and files are reported with their types and file sizes
+    assert get_project_structure() == expected
+    assert get_file(os.path.join("src", "utils", "helpers.js")) == "// Helper functions"
+    assert get_instructions() == []
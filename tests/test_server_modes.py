@@ -4,87 +4,43 @@ Tests for the Aerith Admin MCP server operation modes (HTTP and STDIO).
 """
 import os
 import sys
-import time
+import asyncio
 import threading
-import subprocess
 import signal
 import json
-import pytest
-import uvicorn  # Import uvicorn explicitly
-import requests  # Add back missing import
 from unittest import mock
-from io import StringIO
+from io import BytesIO, StringIO
 
 # Import the test fixture
-from conftest import add_mcp_to_path, configure_logging
+from conftest import configure_logging
 
 
 class TestServerModes:
     """Test class for HTTP and STDIO server modes."""
     
-    @pytest.mark.parametrize("port", [8091])  # Use a non-default port for testing
-    def test_http_server_startup(self, tmpdir, port):
+    @mock.patch("uvicorn.run")
+    def test_http_server_startup(self, mock_run, mcp_instance, tmp_path, monkeypatch):
         """Test HTTP server startup and basic functionality."""
+        import server
+        
         # Set up test environment
-        os.chdir(tmpdir)
+        monkeypatch.chdir(tmp_path)
+        mock_mcp = mock.MagicMock(spec=type(mcp_instance))
+        monkeypatch.setattr(server, "mcp", mock_mcp)
         
-        # Let's test the HTTP server mode without threading
-        # by directly calling the code that would run in the if __name__ == "__main__" block
+        server.run_http_server(8091)  # Use a non-default port for testing
         
-        # Mock necessary components
-        with mock.patch('uvicorn.run') as mock_run:
-            # Set up the port argument
-            with mock.patch.object(sys, 'argv', ['server.py', '--port', str(port)]):
-                # Import server module
-                import server
-                
-                # Create a mock FastMCP instance returned by server.FastMCP
-                mock_mcp = mock.MagicMock()
-                mock_mcp.sse_app.return_value = "mock_app"
-                
-                # Replace server's mcp with our mock
-                original_mcp = server.mcp
-                server.mcp = mock_mcp
-                
-                try:
-                    # Call the function with our mocked values
-                    # This simulates the execution of the __main__ block in non-stdio mode
-                    if hasattr(server, 'main'):
-                        # If there's a main function, call it directly
-                        server.main()
-                    else:
-                        # Otherwise, execute the main part directly
-                        # Get the use_stdio flag from sys.argv
-                        use_stdio = "--stdio" in sys.argv
-                        
-                        if not use_stdio:
-                            host = "0.0.0.0"
-                            port_to_use = port
-                            
-                            app = mock_mcp.sse_app()
-                            
-                            # Use the imported uvicorn directly, not through the server module
-                            uvicorn.run(
-                                app, 
-                                host=host, 
-                                port=port_to_use,
-                                log_level="info"
-                            )
-                    
-                    # Verify that uvicorn.run was called with the correct arguments
-                    mock_run.assert_called_once()
-                    call_args = mock_run.call_args[1]
-                    assert call_args['port'] == port
-                    assert call_args['host'] == '0.0.0.0'
-                    
-                finally:
-                    # Restore original values
-                    server.mcp = original_mcp
+        # Verify that uvicorn.run was called with the SSE app and the correct arguments
+        mock_run.assert_called_once()
+        assert mock_run.call_args[0] == (mock_mcp.sse_app.return_value,)
+        call_args = mock_run.call_args[1]
+        assert call_args['port'] == 8091
+        assert call_args['host'] == '0.0.0.0'
     
-    def test_stdio_mode_startup(self, tmpdir):
+    def test_stdio_mode_startup(self, tmp_path, monkeypatch):
         """Test STDIO mode startup."""
         # Set up test environment
-        os.chdir(tmpdir)
+        monkeypatch.chdir(tmp_path)
         
         # Let's test the STDIO server mode without threading
         # by directly calling the code that would run in the if __name__ == "__main__" block
@@ -101,12 +57,14 @@ class TestServerModes:
                     with mock.patch('time.sleep') as mock_sleep:  # Prevent actual sleep
                         # Set up sys.argv for stdio mode
                         with mock.patch.object(sys, 'argv', ['server.py', '--stdio']):
-                            # Mock stdin and stdout
-                            mock_stdin = StringIO('{"jsonrpc":"2.0","method":"ping","params":{},"id":"test-1"}')
+                            # Give stdin a binary buffer like a real pipe; run_stdio_async is
+                            # mocked above, so nothing actually reads it
+                            mock_stdin = BytesIO(b'{"jsonrpc":"2.0","method":"ping","params":{},"id":"test-1"}')
+                            monkeypatch.setattr(sys, "stdin", mock.Mock(buffer=mock_stdin))
                             mock_stdout = StringIO()
                             
-                            # Replace sys.stdin and sys.stdout temporarily
-                            with mock.patch.object(sys, 'stdin', mock_stdin), mock.patch.object(sys, 'stdout', mock_stdout):
+                            # Replace sys.stdout temporarily
+                            with mock.patch.object(sys, 'stdout', mock_stdout):
                                 # Import server module
                                 import server
                                 
@@ -125,124 +83,71 @@ class TestServerModes:
                                     # Verify run_stdio_async was called
                                     mock_run_stdio.assert_called_once()
     
-    def test_signal_handler(self):
+    def test_signal_handler(self, monkeypatch):
         """Test the signal handler for graceful shutdown."""
         # Import the server module
         import server
         
-        # Mock sys.exit to prevent actual exit
-        with mock.patch('sys.exit') as mock_exit:
-            # Call the signal handler directly
-            server.signal_handler(signal.SIGINT, None)
-            
-            # Verify sys.exit was called
-            mock_exit.assert_called_once_with(0)
+        # Record exit codes instead of exiting
+        called = []
+        monkeypatch.setattr(sys, "exit", called.append)
+        
+        # Call the signal handler directly
+        server.signal_handler(signal.SIGINT, None)
+        
+        # Verify sys.exit was called
+        assert called == [0]
 
 
-@pytest.mark.slow
-class TestServerProcessIntegration:
-    """Integration tests that launch actual server processes.
+class TestServerInProcess:
+    """Tests that drive the real MCP transports in-process.
     
-    These tests are marked as slow because they launch actual processes.
-    Skip with pytest -m "not slow" to avoid running these tests.
+    The HTTP app is exercised through httpx's ASGITransport and the
+    JSON-RPC protocol through in-memory streams, so no server process,
+    port or startup sleep is needed.
     """
     
-    def test_actual_http_server(self, tmpdir):
-        """Test launching an actual HTTP server process and making a request."""
-        # Set up test environment
-        os.chdir(tmpdir)
-        os.makedirs(os.path.join(tmpdir, ".aerith", "instructions"), exist_ok=True)
+    def test_http_app(self, mcp_instance, tmp_path, monkeypatch):
+        """Test requests going through the SSE app's ASGI stack."""
+        import httpx
         
-        port = 8092  # Use a specific port for this test
+        # Set up test environment
+        monkeypatch.chdir(tmp_path)
         
-        # Get the server path
-        server_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'server.py')
+        app = mcp_instance.sse_app()
+        assert {route.path for route in app.routes} == {"/sse", "/messages"}
         
-        # Start the server as a subprocess
-        server_process = subprocess.Popen(
-            [sys.executable, server_path, '--port', str(port)],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            preexec_fn=os.setsid  # Create a new process group
-        )
+        async def post_message():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post("/messages/")
         
-        try:
-            # Wait for the server to start up
-            time.sleep(2)
-            
-            # Try to make a request to the server
-            response = requests.get(f'http://localhost:{port}/')
-            
-            # Check the response
-            assert response.status_code == 200
-            
-        finally:
-            # Kill the server process group
-            os.killpg(os.getpgid(server_process.pid), signal.SIGTERM)
-            server_process.wait()
+        # Posting a message without an SSE session is rejected by the transport
+        response = asyncio.run(post_message())
+        assert response.status_code == 400
+        assert "session_id" in response.text
     
-    def test_actual_stdio_server(self, tmpdir):
-        """Test launching an actual STDIO server process and sending a command."""
+    def test_jsonrpc_session(self, mcp_instance, tmp_path, monkeypatch):
+        """Test calling a tool over an in-memory JSON-RPC session."""
+        from mcp.shared.memory import create_connected_server_and_client_session
+        
         # Set up test environment
-        os.chdir(tmpdir)
-        os.makedirs(os.path.join(tmpdir, ".aerith", "instructions"), exist_ok=True)
-        
-        # Get the server path
-        server_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'server.py')
-        
-        # Create a simple JSON-RPC request
-        request = {
-            "jsonrpc": "2.0",
-            "method": "create_instruction",
-            "params": {
-                "title": "Test Instruction",
-                "description": "Test Description",
-                "goal": "Test Goal",
-                "priority": "low"
-            },
-            "id": "test-1"
-        }
-        
-        request_json = json.dumps(request)
-        request_bytes = request_json.encode('utf-8')
-        
-        # Format the request with Content-Length header
-        stdin_data = f"Content-Length: {len(request_bytes)}\r\n\r\n{request_json}"
-        
-        # Start the server as a subprocess
-        server_process = subprocess.Popen(
-            [sys.executable, server_path, '--stdio'],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        
-        try:
-            # Send the request
-            server_process.stdin.write(stdin_data.encode('utf-8'))
-            server_process.stdin.flush()
-            
-            # Read the response header
-            response_header = server_process.stdout.readline().decode('utf-8')
-            assert response_header.startswith('Content-Length: ')
-            
-            # Skip empty line
-            server_process.stdout.readline()
-            
-            # Read the expected content length
-            content_length = int(response_header.split(': ')[1])
-            
-            # Read the response
-            response_data = server_process.stdout.read(content_length).decode('utf-8')
-            response = json.loads(response_data)
-            
-            # Verify the response contains expected fields
-            assert "jsonrpc" in response
-            assert "id" in response
-            assert response["id"] == "test-1"
-            assert "result" in response
-            
-        finally:
-            # Terminate the server process
-            server_process.terminate()
-            server_process.wait() 
\ No newline at end of file
+        monkeypatch.chdir(tmp_path)
+        os.makedirs(os.path.join(tmp_path, ".aerith", "instructions"), exist_ok=True)
+        
+        async def call_create_instruction():
+            async with create_connected_server_and_client_session(mcp_instance._mcp_server) as client:
+                return await client.call_tool("create_instruction", {
+                    "title": "Test Instruction",
+                    "description": "Test Description",
+                    "goal": "Test Goal",
+                    "priority": "low"
+                })
+        
+        result = asyncio.run(asyncio.wait_for(call_create_instruction(), timeout=10))
+        
+        # Verify the response contains the created instruction
+        assert result.isError is False
+        response = json.loads(result.content[0].text)
+        assert response["success"] is True
+        assert response["instruction"]["title"] == "Test Instruction"
@@ -4,189 +4,209 @@ Tests for utility functions in the MCP server including file operations and comm
 """
 import os
 import sys
-import json
+import types
+import orjson
 import pytest
 from pathlib import Path
-
-# Import the test fixture
-from conftest import add_mcp_to_path
+from unittest import mock
 
 # Import the functions we need for testing
-from server import read_file, write_file, run_command, get_project_root
+import server
+from server import read_file, write_file, run_command, get_project_root, _save_instruction, _load_instruction
+
+
+_IS_WINDOWS = os.name == "nt"
+
+# File contents, encoded once at import time
+READ_CONTENT = "This is a test file content"
+READ_CONTENT_B = READ_CONTENT.encode()
+WRITE_CONTENT = "This is content to write"
+WRITE_CONTENT_B = WRITE_CONTENT.encode()
+
+# Sample instruction for the JSON handling tests
+INSTRUCTION = {
+    "id": "test-123",
+    "title": "Test Instruction",
+    "description": "This is a test",
+    "goal": "Testing JSON serialization",
+    "priority": "medium",
+    "status": "created",
+    "created_at": 1234567890,
+    "workflow_step": "USER_INSTRUCTION"
+}
+
+# Source for the output capture test, run with python -c
+MULTILINE_SRC = 'print("hello")\nprint("This is a test script")\nprint("It has multiple lines")'
 
 
 class TestUtilityFunctions:
     """Test class for utility functions in the server."""
     
-    def test_get_project_root(self, tmpdir):
+    def test_get_project_root(self, project_root_cached, tmp_path, monkeypatch):
         """Test the get_project_root function."""
-        # Set up test environment
-        os.chdir(tmpdir)
-        
         # The function should return the current working directory
         root = get_project_root()
         assert isinstance(root, Path)
-        assert root == Path(os.getcwd())
+        assert root == project_root_cached
+        
+        # It must follow the cwd rather than cache it
+        monkeypatch.chdir(tmp_path)
+        assert get_project_root() == tmp_path
     
-    def test_read_file(self, tmpdir):
+    def test_read_file(self, tmp_chdir):
         """Test reading a file with read_file function."""
-        # Set up test environment
-        os.chdir(tmpdir)
-        
         # Create a test file
-        test_content = "This is a test file content"
         test_file = "test_read.txt"
         
-        with open(test_file, "w") as f:
-            f.write(test_content)
+        Path(test_file).write_bytes(READ_CONTENT_B)
         
         # Read the file using the function
         content = read_file(test_file)
         
         # Verify the content
-        assert content == test_content
+        assert content == READ_CONTENT
         
         # Test reading a non-existent file
         non_existent = "non_existent_file.txt"
         content = read_file(non_existent)
-        assert "Error reading file" in content
+        assert content.startswith("Error reading file")
     
-    def test_write_file(self, tmpdir):
+    def test_write_file(self, fast_tmp, monkeypatch):
         """Test writing to a file with write_file function."""
         # Set up test environment
-        os.chdir(tmpdir)
+        monkeypatch.chdir(fast_tmp)
         
         # Test writing to a new file
-        test_content = "This is content to write"
-        test_file = os.path.join(tmpdir, "test_write.txt")  # Use absolute path
+        test_file = fast_tmp / "test_write.txt"  # Use absolute path
         
-        result = write_file(test_file, test_content)
+        result = write_file(str(test_file), WRITE_CONTENT)
         
         # Verify the result
         assert result is True
         
         # Verify the file was created with the correct content
-        with open(test_file, "r") as f:
-            content = f.read()
-        
-        assert content == test_content
+        assert test_file.read_bytes() == WRITE_CONTENT_B
         
         # Test writing to a nested directory
-        nested_path = os.path.join(tmpdir, "nested", "dir", "test.txt")  # Use absolute path
-        result = write_file(nested_path, test_content)
+        nested_path = fast_tmp / "nested" / "dir" / "test.txt"  # Use absolute path
+        result = write_file(str(nested_path), WRITE_CONTENT)
         
         # Verify the result
         assert result is True
         
         # Verify the file was created with the correct content
-        with open(nested_path, "r") as f:
-            content = f.read()
-        
-        assert content == test_content
-        assert os.path.exists(os.path.dirname(nested_path))
-        
-        # Test writing to a location with insufficient permissions
-        # Note: This test is OS-dependent, so we'll check for the platform
-        import platform
-        if platform.system() != "Windows":  # Skip on Windows
-            # Create a directory without write permissions
-            readonly_dir = os.path.join(tmpdir, "readonly_dir")  # Use absolute path
-            os.makedirs(readonly_dir, exist_ok=True)
-            os.chmod(readonly_dir, 0o555)  # read and execute only
-            
-            try:
-                readonly_file = os.path.join(readonly_dir, "test.txt")
-                result = write_file(readonly_file, test_content)
-                
-                # On some systems, this might still succeed due to permissions handling
-                # So we don't strictly assert the result
-                if not result:
-                    assert result is False
-            finally:
-                # Restore permissions for cleanup
-                os.chmod(readonly_dir, 0o755)
+        assert nested_path.read_bytes() == WRITE_CONTENT_B
     
-    def test_run_command(self, tmpdir):
+    def test_write_file_single_write(self, fast_tmp):
+        """Test that write_file hands the content to a single write() call."""
+        # Shadow open() in the server module only, so nothing else is affected
+        probe = mock.mock_open()
+        with mock.patch("server.open", probe, create=True):
+            result = write_file(str(fast_tmp / "probe.txt"), WRITE_CONTENT)
+        
+        assert result is True
+        probe().write.assert_called_once_with(WRITE_CONTENT)
+    
+    @pytest.mark.skipif(_IS_WINDOWS, reason="chmod semantics differ on Windows")
+    def test_write_file_readonly(self, readonly_dir):
+        """Test writing to a location with insufficient permissions."""
+        result = write_file(str(readonly_dir / "test.txt"), WRITE_CONTENT)
+        
+        # On some systems, this might still succeed due to permissions handling
+        # So we don't strictly assert the result
+        if not result:
+            assert result is False
+    
+    def test_run_command(self, fast_tmp, monkeypatch):
         """Test running commands with run_command function."""
         # Set up test environment
-        os.chdir(tmpdir)
+        monkeypatch.chdir(fast_tmp)
         
-        # Test a simple command
-        if os.name == "nt":  # Windows
-            result = run_command(["cmd", "/c", "echo", "hello"])
-        else:  # Unix-like
-            result = run_command(["echo", "hello"])
+        # One process covers both single-line and multi-line output capture
+        result = run_command([sys.executable, "-c", MULTILINE_SRC])
         
         # Verify the result
         assert result["success"] is True
-        assert "hello" in result["output"]
         assert result["returncode"] == 0
+        for needle in ("hello", "This is a test script", "It has multiple lines"):
+            assert needle in result["output"]
+
+    @pytest.mark.parametrize("returncode,stdout,stderr", [
+        (0, "hello\n", ""),
+        (1, "", "failure\n"),
+        (127, "", "invalid_command: not found\n"),
+    ], ids=["success", "failure", "not-found"])
+    def test_run_command_contract(self, monkeypatch, returncode, stdout, stderr):
+        """Test the result dict run_command builds from a finished process, without spawning one."""
+        monkeypatch.setattr(
+            "subprocess.run",
+            lambda *args, **kwargs: types.SimpleNamespace(returncode=returncode, stdout=stdout, stderr=stderr)
+        )
+        
+        result = run_command(["x"])
+        
+        assert result == {
+            "success": returncode == 0,
+            "output": stdout,
+            "error": stderr,
+            "returncode": returncode
+        }
+    
+    def test_run_command_spawn_error(self, monkeypatch):
+        """Test that a command which cannot be started is reported, not raised."""
+        def missing_executable(*args, **kwargs):
+            raise FileNotFoundError(2, "No such file or directory", "invalid_command")
+        monkeypatch.setattr("subprocess.run", missing_executable)
         
-        # Test a command that fails
-        if os.name == "nt":  # Windows
-            result = run_command(["cmd", "/c", "invalid_command"])
-        else:  # Unix-like
-            result = run_command(["invalid_command"])
+        result = run_command(["invalid_command"])
         
-        # Verify the result
         assert result["success"] is False
-        assert result["returncode"] != 0
-        
-        # Test a more complex command
-        # Create a test file
-        with open(os.path.join(tmpdir, "test_script.py"), "w") as f:  # Use absolute path
-            f.write("""
-print("This is a test script")
-print("It has multiple lines")
-exit(0)
-            """)
-        
-        # Make it executable on Unix-like systems
-        if os.name != "nt":
-            os.chmod(os.path.join(tmpdir, "test_script.py"), 0o755)
-        
-        # Run the script
-        result = run_command([sys.executable, os.path.join(tmpdir, "test_script.py")])  # Use absolute path
-        
-        # Verify the result
+        assert result["output"] == ""
+        assert "invalid_command" in result["error"]
+        assert result["returncode"] == -1
+
+    @pytest.mark.skipif(_IS_WINDOWS, reason="posix_spawn fast path is POSIX-only")
+    def test_run_command_read_only(self, tmp_chdir):
+        """Test that read-only commands run through the fast spawn path."""
+        result = run_command(["echo", "hello"], read_only=True)
+
+        # The result contract is identical to the regular path
         assert result["success"] is True
-        assert "This is a test script" in result["output"]
-        assert "It has multiple lines" in result["output"]
+        assert "hello" in result["output"]
+        assert result["returncode"] == 0
+
+        # Unknown commands still fail gracefully
+        result = run_command(["invalid_command"], read_only=True)
+        assert result["success"] is False
+        assert result["returncode"] != 0
 
 
 class TestJsonHandling:
     """Test class for JSON handling in the server."""
     
-    def test_json_serialization(self, tmpdir):
-        """Test saving and loading JSON files."""
-        # Set up test environment
-        os.chdir(tmpdir)
-        os.makedirs(os.path.join(tmpdir, ".aerith", "instructions"), exist_ok=True)
-        
-        # Create a sample instruction
-        instruction = {
-            "id": "test-123",
-            "title": "Test Instruction",
-            "description": "This is a test",
-            "goal": "Testing JSON serialization",
-            "priority": "medium",
-            "status": "created",
-            "created_at": 1234567890,
-            "workflow_step": "USER_INSTRUCTION"
-        }
-        
-        # Save it to a file
-        json_path = os.path.join(tmpdir, ".aerith", "instructions", "test-123.json")  # Use absolute path
-        os.makedirs(os.path.dirname(json_path), exist_ok=True)
-        
-        with open(json_path, "w") as f:
-            json.dump(instruction, f, indent=2)
+    def test_json_roundtrip_inmem(self, tmp_chdir, monkeypatch):
+        """Test that an instruction survives the in-memory store without touching the disk."""
+        monkeypatch.setenv("AERITH_STORE", "memory")
+        monkeypatch.setattr(server, "_memory_instructions", {})
         
-        # Read it back
-        with open(json_path, "r") as f:
-            loaded = json.load(f)
+        assert _save_instruction(INSTRUCTION) is None
+        loaded = _load_instruction("test-123")
         
         # Verify it matches
-        assert loaded == instruction
+        assert loaded == INSTRUCTION
         assert loaded["id"] == "test-123"
-        assert loaded["title"] == "Test Instruction" 
\ No newline at end of file
+        assert loaded["title"] == "Test Instruction"
+        assert not (tmp_chdir / ".aerith").exists()
+    
+    def test_json_roundtrip_disk(self, tmp_chdir, monkeypatch):
+        """Test saving and loading instruction JSON files."""
+        monkeypatch.setenv("AERITH_STORE", "file")
+        
+        # Save it to a file
+        json_path = Path(_save_instruction(INSTRUCTION))
+        assert json_path == tmp_chdir / ".aerith" / "instructions" / "test-123.json"
+        assert orjson.loads(json_path.read_bytes()) == INSTRUCTION
+        
+        # Read it back
+        assert _load_instruction("test-123") == INSTRUCTION
+        assert _load_instruction("missing") is None